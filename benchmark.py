@@ -0,0 +1,373 @@
+'''
+Benchmark of ninvoicevox with fake voicevox engine.
+It does not need voicevox engine nor sound device.
+
+python benchmark.py
+python benchmark.py --latency 0.05 --repeat 20
+
+Results are appended to a json file with version of ninvoicevox and
+compared with the previous result, so regressions can be found.
+'''
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median, quantiles
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, List
+from urllib.request import Request, urlopen
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import ninvoicevox
+from ninvoicevox import AsyncQueue, CacheFormat, Speaker
+from ninvoicevox.cache import DICTIONARY_INDEX
+from ninvoicevox.fakeengine import FakeEngine
+from ninvoicevox.phrasebank import PhraseBank
+from ninvoicevox.player import CommandPlayer, NullPlayer
+from ninvoicevox.talker import HEADER_JSON, dict2post
+
+NULL_PLAYER = NullPlayer()
+SENTENCE = 'これはベンチマークのための文章なのだ。'
+LONG_TEXT = '処理が始まりました。データを読み込んでいます、少々お待ちください。\n'\
+    * 5
+
+
+def measure(func: Callable[[int], None], repeat: int) -> Dict[str, float]:
+    '''
+    Call func(n) repeat times and return statistics of seconds.
+    '''
+    times: List[float] = []
+    for n in range(repeat):
+        t = time.perf_counter()
+        func(n)
+        times.append(time.perf_counter() - t)
+    return dict(median=median(times),
+                p90=quantiles(times, n=10)[-1] if repeat > 1 else times[0],
+                min=min(times))
+
+
+def bench_first_audio(url: str, repeat: int) -> Dict[str, float]:
+    '''
+    Seconds from Speaker.text to getting voice without cache.
+    '''
+    speaker = Speaker(url=url)
+    return measure(lambda n: speaker.text(f'{n}{SENTENCE}').get(), repeat)
+
+
+def bench_warmup(latency: float, repeat: int,
+                 init_latency: float = 0.5) -> Dict[str, dict]:
+    '''
+    Seconds to get the first voice when model of voice is loaded lazily,
+    with and without warmup. Other work is assumed to take
+    init_latency seconds between making Speaker and the first voice.
+    '''
+    result = {}
+    for warmup in (False, True):
+        times: List[float] = []
+        for _ in range(repeat):
+            with FakeEngine(latency=latency,
+                            init_latency=init_latency) as engine:
+                speaker = Speaker(url=engine.url, warmup=warmup)
+                time.sleep(init_latency)
+                t = time.perf_counter()
+                speaker.text(SENTENCE).get()
+                times.append(time.perf_counter() - t)
+        result['warmup' if warmup else 'cold'] = dict(
+            median=median(times), min=min(times))
+    return result
+
+
+def bench_cache(url: str, repeat: int) -> Dict[str, dict]:
+    '''
+    Seconds to get voice with disk cache, miss and hit.
+    '''
+    with TemporaryDirectory() as directory:
+        speaker = Speaker(url=url, preload=False, enable_cache=True,
+                          directory=directory)
+        miss = measure(lambda n: speaker.text(f'{n}{SENTENCE}').get(),
+                       repeat)
+        hit = measure(lambda n: speaker.text(f'{n}{SENTENCE}').get(),
+                      repeat)
+    return dict(miss=miss, hit=hit)
+
+
+def bench_cache_format(url: str, repeat: int) -> Dict[str, dict]:
+    '''
+    Size of cache file and seconds to load it by CacheFormat.
+    Voice of fake engine is simple sine wave, and so ratio of
+    compression is much better than real voice.
+    '''
+    formats = {
+        'wav': None,
+        'zlib': CacheFormat('zlib'),
+        'lzma': CacheFormat('lzma'),
+        'mono': CacheFormat(mono=True),
+        'mono_16k_zlib': CacheFormat('zlib', True, 16000),
+        'mono_16k_lzma': CacheFormat('lzma', True, 16000),
+    }
+    result = {}
+    for name, cache_format in formats.items():
+        with TemporaryDirectory() as directory:
+            speaker = Speaker(url=url, preload=False, enable_cache=True,
+                              directory=directory, cache_format=cache_format)
+            speaker.text(LONG_TEXT).get()
+            size = sum(f.stat().st_size for f in Path(directory).iterdir()
+                       if f.name != DICTIONARY_INDEX)
+            result[name] = measure(
+                lambda n: speaker.text(LONG_TEXT).get(), repeat)
+            result[name]['bytes'] = size
+    return result
+
+
+def bench_voices(url: str, repeat: int) -> Dict[str, float]:
+    '''
+    Seconds to speak long text by Voices with null player.
+    '''
+    speaker = Speaker(url=url, parallel=True)
+    result = measure(
+        lambda n: speaker.text(f'{n}{LONG_TEXT}').speak(NULL_PLAYER, sep=0),
+        repeat)
+    result['chars_per_second'] = len(LONG_TEXT) / result['median']
+    return result
+
+
+def bench_map(url: str, repeat: int, size: int = 20) -> Dict[str, dict]:
+    '''
+    Seconds to get voices of many texts by Speaker.map,
+    compared with getting them one by one.
+    '''
+    speaker = Speaker(url=url, preload=False)
+    texts = [f'{n}{SENTENCE}' for n in range(size)]
+    sequential = measure(
+        lambda n: [speaker.text(text).get() for text in texts], repeat)
+    ordered = measure(
+        lambda n: list(speaker.map(texts, concurrency=8)), repeat)
+    unordered = measure(
+        lambda n: list(speaker.map(texts, concurrency=8, ordered=False)),
+        repeat)
+    return dict(sequential=sequential, ordered=ordered, unordered=unordered)
+
+
+def bench_hedge(latency: float, repeat: int, size: int = 50,
+                tail_ratio: float = 0.1) -> Dict[str, dict]:
+    '''
+    Seconds to get voice from two engines with tail latency,
+    with and without hedged requests.
+    '''
+    result = {}
+    for percentile in (None, 0.8):
+        with FakeEngine(latency=latency, tail_ratio=tail_ratio) as main,\
+                FakeEngine(latency=latency, tail_ratio=tail_ratio) as other:
+            speaker = Speaker(url=main.url, preload=False,
+                              hedge_percentile=percentile,
+                              hedge_urls=[other.url])
+            times = []
+            for n in range(repeat * size):
+                t = time.perf_counter()
+                speaker.text(f'{n}{SENTENCE}').get()
+                times.append(time.perf_counter() - t)
+        result['hedged' if percentile else 'plain'] = dict(
+            median=median(times), p99=quantiles(times, n=100)[-1])
+    return result
+
+
+def bench_phrasebank(url: str, repeat: int,
+                     size: int = 200) -> Dict[str, dict]:
+    '''
+    Memory to keep many phrases as dict of Voice and as PhraseBank,
+    and seconds to get them or to open saved PhraseBank.
+    '''
+    texts = [f'{n}{SENTENCE}' for n in range(size)]
+    speaker = Speaker(url=url)
+
+    def voices() -> dict:
+        table = {text: speaker.text(text) for text in texts}
+        for voice in table.values():
+            voice.get()
+        return table
+    result: Dict[str, dict] = {}
+    for name, make in (('voices', voices),
+                       ('bank', lambda: PhraseBank.load(speaker, texts))):
+        tracemalloc.start()
+        t = time.perf_counter()
+        table = make()
+        spent = time.perf_counter() - t
+        result[name] = dict(seconds=spent,
+                            bytes=tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+    with TemporaryDirectory() as directory:
+        path = Path(directory) / 'phrases.wav'
+        table.save(path)
+        result['open'] = measure(
+            lambda n: PhraseBank.open(path).close(), repeat)
+    return result
+
+
+def bench_copies() -> Dict[str, float]:
+    '''
+    Peak memory per byte of WAV to get, load and play an utterance,
+    measured by tracemalloc. 1.0 means that WAV is allocated once, and
+    more means it is copied. FakeEngine runs in another process,
+    so that memory of the server is not traced.
+    '''
+    def peak(func: Callable[[], object]) -> float:
+        tracemalloc.start()
+        func()
+        value = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return value / size
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    url = f'http://127.0.0.1:{port}'
+    # The process imports the same ninvoicevox from any directory.
+    package = Path(ninvoicevox.__file__).resolve().parent.parent
+    path = os.pathsep.join(filter(None, (str(package),
+                                         os.environ.get('PYTHONPATH'))))
+    engine = subprocess.Popen(
+        [sys.executable, '-c',
+         'import sys\n'
+         'from ninvoicevox.fakeengine import FakeEngine\n'
+         f'with FakeEngine(port={port}):\n'
+         '    sys.stdin.read()'],
+        stdin=subprocess.PIPE, env=dict(os.environ, PYTHONPATH=path))
+    with engine, TemporaryDirectory() as directory:
+        speaker = Speaker(url=url, preload=False, enable_cache=True,
+                          directory=directory)
+        # Wait until the server listens.
+        for _ in range(100):
+            try:
+                voice = speaker.text(LONG_TEXT)
+                size = len(voice.get())
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError(f'FakeEngine did not start at {url}.')
+        cache = Path(directory) / voice.make_fname()
+        request = Request(f'{url}/synthesis?speaker={speaker.speaker_id}',
+                          dict2post(voice.token_dict), HEADER_JSON)
+        player = CommandPlayer(['sh', '-c', 'cat > /dev/null'])
+        return dict(
+            http=peak(lambda: urlopen(request).read()),
+            cache=peak(cache.read_bytes),
+            play_bytes=peak(lambda: player.play(voice.get())),
+            play_sendfile=peak(lambda: player.play_file(cache)),
+            speak=peak(lambda: speaker.text(LONG_TEXT).speak(player)),
+        )
+
+
+def bench_queue(repeat: int, size: int = 1000) -> Dict[str, float]:
+    '''
+    Seconds of AsyncQueue per item.
+    '''
+    def run(n: int) -> None:
+        with AsyncQueue() as aq:
+            for _ in range(size):
+                aq.put(int)
+    result = measure(run, repeat)
+    return {key: value / size for key, value in result.items()}
+
+
+def bench_progress(url: str, repeat: int,
+                   size: int = 100000) -> Dict[str, float]:
+    '''
+    Seconds added to each item of a loop by Speaker.progress,
+    after its messages are got.
+    '''
+    speaker = Speaker(url=url)
+
+    def bare(n: int) -> None:
+        for _ in iter(range(size)):
+            pass
+
+    def wrapped(n: int) -> None:
+        progress = speaker.progress(range(size), every=1,
+                                    command=NULL_PLAYER)
+        for voice in progress.voices:
+            voice.get()
+        t = time.perf_counter()
+        for _ in progress:
+            pass
+        times.append(time.perf_counter() - t)
+    times: List[float] = []
+    base = measure(bare, repeat)['median']
+    measure(wrapped, repeat)
+    return dict(median=(median(times) - base) / size,
+                min=(min(times) - base) / size)
+
+
+def version() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def flatten(result: dict, prefix: str = '') -> Dict[str, float]:
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}.'))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(previous: dict, current: dict, threshold: float) -> None:
+    '''
+    Show ratio of medians to previous result.
+    '''
+    old = flatten(previous['results'])
+    print(f'Compared with {previous["version"]}')
+    for key, value in flatten(current['results']).items():
+        if not key.endswith('median') or not old.get(key):
+            continue
+        ratio = value / old[key]
+        mark = ' <- slower' if ratio > 1 + threshold else ''
+        print(f'  {key}: {ratio:.2f}x{mark}')
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark of ninvoicevox.')
+    parser.add_argument('-r', '--repeat', type=int, default=10)
+    parser.add_argument('-l', '--latency', type=float, default=0.02,
+                        help='Latency of fake engine in seconds.')
+    parser.add_argument('-o', '--output', default='benchmark_results.json',
+                        help='Json file to append results.')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                        help='Ratio to report as slower.')
+    args = parser.parse_args()
+    with FakeEngine(latency=args.latency) as engine:
+        results = {
+            'first_audio': bench_first_audio(engine.url, args.repeat),
+            'cache': bench_cache(engine.url, args.repeat),
+            'first_voice': bench_warmup(args.latency, args.repeat),
+            'cache_format': bench_cache_format(engine.url, args.repeat),
+            'voices': bench_voices(engine.url, args.repeat),
+            'map': bench_map(engine.url, args.repeat),
+            'hedge': bench_hedge(args.latency, args.repeat),
+            'phrasebank': bench_phrasebank(engine.url, args.repeat),
+            'copies_per_byte': bench_copies(),
+            'queue_per_item': bench_queue(args.repeat),
+            'progress_per_item': bench_progress(engine.url, args.repeat),
+        }
+    current = dict(version=version(), time=time.time(),
+                   latency=args.latency, results=results)
+    print(json.dumps(current, indent=2))
+    path = Path(args.output)
+    history = json.loads(path.read_text()) if path.exists() else []
+    if history:
+        compare(history[-1], current, args.threshold)
+    history.append(current)
+    path.write_text(json.dumps(history, indent=2))
+
+
+if __name__ == '__main__':
+    main()
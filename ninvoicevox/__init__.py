@@ -1,3 +1,9 @@
-from .voice import Speaker, SpeakerInfo, get_speaker_info, NameStyle, Dictionary
+from .voice import (Speaker, SpeakerInfo, get_speaker_info, NameStyle,
+                    Dictionary, Word, load_words)
 from .talker import Talker
 from .asyncqueue import AsyncQueue
+from .metrics import Metrics
+from .cache import CacheFormat
+from .dialogue import Dialogue, Line
+from .template import Template, SplicedVoice
+from .phrasebank import PhraseBank
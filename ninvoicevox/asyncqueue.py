@@ -9,6 +9,8 @@ from queue import Queue
 from typing import Any, List, Optional
 from threading import Thread, Lock
 from doctest import testmod
+import time
+from .metrics import Metrics, metrics
 
 
 class AsyncQueue:
@@ -46,17 +48,22 @@ class AsyncQueue:
         If it is True, this programm is not terminated.
         It may be good if you want to make daemon.
         If it is True, save_results forced to be false.
+    metrics: Metrics
+        Seconds from put to start of procedure are recorded
+        as queue_wait_seconds.
     '''
 
     def __init__(self, end_object: Any = None,
                  save_results: bool = False,
-                 endless: bool = False):
+                 endless: bool = False,
+                 metrics: Metrics = metrics):
         self.run = False
         self.queue: Queue = Queue()
         self.save_results = save_results
         self.end_object = end_object
         self.endless = endless
         self.results: List[Any] = []
+        self.metrics = metrics
 
     def repeat(self) -> None:
         '''
@@ -65,9 +72,11 @@ class AsyncQueue:
         process them asynchronously.
         '''
         while True:
-            obj = self.queue.get()
+            put_time, obj = self.queue.get()
             if not self.endless and obj is self.end_object:
                 break
+            self.metrics.observe('queue_wait_seconds',
+                                 time.perf_counter() - put_time)
             result = obj[0](*obj[1:])
             if self.save_results:
                 self.results.append(result)
@@ -87,13 +96,13 @@ class AsyncQueue:
         First argument is function and following arguments are
         arguments for the function.
         '''
-        self.queue.put(data)
+        self.queue.put((time.perf_counter(), data))
 
     def __del__(self):
         self.end()
 
     def end(self) -> list:
-        self.queue.put(None)
+        self.queue.put((time.perf_counter(), None))
         self.thread.join()
         return self.results
 
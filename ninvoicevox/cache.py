@@ -0,0 +1,322 @@
+'''
+Helpers of disk cache of voices.
+Voices are cached by Voice.save_cache and this module keeps
+additional information in the same directory.
+'''
+import atexit
+import json
+import lzma
+import os
+import time
+import zlib
+from collections import namedtuple
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+from unicodedata import normalize
+from .wav import make_wav, parse_wav, resample, to_mono
+
+DICTIONARY_INDEX = 'dictionary_index.json'
+USAGE_LOG = 'usage.json'
+# Seconds in which weight of past usage becomes half.
+USAGE_HALF_LIFE = 7 * 24 * 3600
+_index_lock = Lock()
+_usage_logs: Dict[Path, 'UsageLog'] = {}
+
+
+def normalize_surface(surface: str) -> str:
+    '''
+    Normalize surface of word.
+    Voicevox saves surface in full width characters and
+    so it is compared after NFKC normalization.
+    '''
+    return normalize('NFKC', surface)
+
+
+class DictionaryIndex:
+    '''
+    Index from surfaces of user dictionary to cache files.
+    If a word of user dictionary is changed, only voices which
+    contains the word are removed from cache.
+    Each cache file is appended to the index as one JSON line, so
+    saving a voice does not rewrite the whole index. Broken lines,
+    for example from a process killed while writing, are ignored.
+
+    directory: str | Path
+        Directory of cache.
+    '''
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self.path = self.directory / DICTIONARY_INDEX
+
+    def _load(self) -> Dict[str, List[str]]:
+        index: Dict[str, List[str]] = {}
+        try:
+            with open(self.path, encoding='utf-8', errors='replace') as fp:
+                lines = fp.readlines()
+        except FileNotFoundError:
+            return index
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            # Index of older versions is one object of all surfaces.
+            if isinstance(entry, dict):
+                items = [(fname, [surface]) for surface, fnames
+                         in entry.items() for fname in fnames]
+            elif isinstance(entry, list) and len(entry) == 2:
+                items = [entry]
+            else:
+                continue
+            for fname, surfaces in items:
+                for surface in surfaces:
+                    fnames = index.setdefault(surface, [])
+                    if fname not in fnames:
+                        fnames.append(fname)
+        return index
+
+    def _save(self, index: Dict[str, List[str]]) -> None:
+        files: Dict[str, List[str]] = {}
+        for surface, fnames in index.items():
+            for fname in fnames:
+                files.setdefault(fname, []).append(surface)
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as fp:
+            for entry in files.items():
+                fp.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp, self.path)
+
+    def add(self, fname: str, surfaces: Iterable[str]) -> None:
+        '''
+        Record that cache file named fname contains surfaces.
+        '''
+        surfaces = sorted({normalize_surface(s) for s in surfaces})
+        if not surfaces:
+            return None
+        # Leading newline keeps the line apart from a broken last line.
+        line = '\n' + json.dumps([fname, surfaces], ensure_ascii=False)
+        with _index_lock:
+            # One write in append mode is not mixed with other writers.
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                         0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+            finally:
+                os.close(fd)
+
+    def invalidate(self, surfaces: Iterable[str]) -> int:
+        '''
+        Remove cache files which contain any of surfaces.
+
+        Returns
+        ----------
+        int: Number of removed files.
+        '''
+        if not self.path.exists():
+            return 0
+        removed = 0
+        with _index_lock:
+            index = self._load()
+            fnames = {fname for surface in surfaces for fname
+                      in index.pop(normalize_surface(surface), [])}
+            if not fnames:
+                return 0
+            for fname in fnames:
+                path = self.directory / fname
+                if path.exists():
+                    path.unlink()
+                    removed += 1
+            for surface in list(index):
+                index[surface] = [fname for fname in index[surface]
+                                  if fname not in fnames]
+                if not index[surface]:
+                    del index[surface]
+            self._save(index)
+        return removed
+
+
+class UsageLog:
+    '''
+    Count and last time of phrases spoken by each configuration of
+    Speaker. Usage is kept in memory and merged into a file in the
+    cache directory at exit, so it is not written on every voice.
+    Use usage_log to share one object by directory.
+
+    directory: str | Path
+        Directory of cache.
+    limit: int
+        Number of phrases kept for each configuration.
+    '''
+
+    def __init__(self, directory: str | Path, limit: int = 1000):
+        self.directory = Path(directory)
+        self.path = self.directory / USAGE_LOG
+        self.limit = limit
+        self.lock = Lock()
+        self.pending: Dict[str, Dict[str, List[float]]] = {}
+        atexit.register(self.flush)
+
+    def record(self, config: str, text: str) -> None:
+        now = time.time()
+        with self.lock:
+            usage = self.pending.setdefault(config, {}).get(text)
+            if usage is None:
+                self.pending[config][text] = [1, now]
+            else:
+                usage[0] += 1
+                usage[1] = now
+
+    def _load(self) -> Dict[str, Dict[str, List[float]]]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as fp:
+                return json.load(fp)
+        except ValueError:
+            return {}
+
+    def _merged(self) -> Dict[str, Dict[str, List[float]]]:
+        log = self._load()
+        for config, phrases in self.pending.items():
+            saved = log.setdefault(config, {})
+            for text, (count, last) in phrases.items():
+                old = saved.get(text, [0, 0.0])
+                saved[text] = [old[0] + count, max(old[1], last)]
+        return log
+
+    @staticmethod
+    def score(count: float, last: float, now: float) -> float:
+        '''
+        Count weighted by recency.
+        '''
+        return count * 0.5 ** ((now - last) / USAGE_HALF_LIFE)
+
+    def top(self, config: str, number: int,
+            now: Optional[float] = None) -> List[str]:
+        '''
+        Phrases which are likely to be spoken, in order.
+        '''
+        now = time.time() if now is None else now
+        with self.lock:
+            phrases = self._merged().get(config, {})
+        return sorted(phrases, key=lambda text: -self.score(
+            *phrases[text], now))[:number]
+
+    def flush(self) -> None:
+        '''
+        Merge usage in memory into the file.
+        '''
+        with self.lock:
+            if not self.pending:
+                return None
+            log = self._merged()
+            now = time.time()
+            for config, phrases in log.items():
+                if len(phrases) > self.limit:
+                    kept = sorted(phrases, key=lambda text: -self.score(
+                        *phrases[text], now))[:self.limit]
+                    log[config] = {text: phrases[text] for text in kept}
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as fp:
+                json.dump(log, fp, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self.pending.clear()
+
+
+def usage_log(directory: str | Path) -> UsageLog:
+    '''
+    UsageLog of the directory, which is shared in the process.
+    '''
+    directory = Path(directory).resolve()
+    with _index_lock:
+        log = _usage_logs.get(directory)
+        if log is None:
+            log = _usage_logs[directory] = UsageLog(directory)
+        return log
+
+
+CacheFormat = namedtuple('CacheFormat', ('compression', 'mono', 'rate'),
+                         defaults=(None, False, 0))
+CacheFormat.__doc__ = '''
+Format to save voice in cache directory.
+mono and rate are applied also to voices got from server,
+so that voices from cache and from server have the same format.
+
+compression: Optional[str]
+    'zlib', 'lzma' or None. Only the file is compressed.
+mono: bool
+    Use only the first channel.
+rate: int
+    Sampling rate to use. It is used only with mono.
+    If 0, it is not changed.
+'''
+COMPRESSIONS = {
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+LZMA_MAGIC = b'\xfd7zXZ\x00'
+
+
+def convert(sound: bytes, cache_format: Optional[CacheFormat]) -> bytes:
+    '''
+    Convert WAV to channels and rate of cache_format.
+    It is done before voice is used and not only on disk, so that
+    voices from cache and from server have the same format.
+    '''
+    if cache_format is None or not (cache_format.mono or cache_format.rate):
+        return sound
+    info = parse_wav(sound)
+    if info.width != 2:
+        return sound
+    pcm = sound[info.offset:info.offset + info.length]
+    channels, rate = info.channels, info.rate
+    if cache_format.mono:
+        pcm, channels = to_mono(pcm, channels), 1
+    if cache_format.rate and channels == 1:
+        pcm, rate = resample(pcm, rate, cache_format.rate),\
+            cache_format.rate
+    return make_wav(pcm, rate, channels)
+
+
+def encode(sound: bytes, cache_format: Optional[CacheFormat]) -> bytes:
+    '''
+    Compress WAV converted by convert to save as cache.
+    If it is not compressed, sound itself is returned.
+    '''
+    if cache_format is not None and cache_format.compression:
+        sound = COMPRESSIONS[cache_format.compression][0](sound)
+    return sound
+
+
+def is_raw_wav(path: str | Path) -> bool:
+    '''
+    True if cache file is WAV which is not compressed,
+    so that it can be played as it is.
+    '''
+    try:
+        with open(path, 'rb') as fp:
+            return fp.read(4) == b'RIFF'
+    except FileNotFoundError:
+        return False
+
+
+def decode(data: bytes) -> bytes:
+    '''
+    Convert cache to WAV. Format is detected from the data,
+    so cache in any format can be loaded.
+    ValueError is raised if the data is broken.
+    '''
+    try:
+        if data[:6] == LZMA_MAGIC:
+            data = lzma.decompress(data)
+        elif data[:4] != b'RIFF':
+            data = zlib.decompress(data)
+    except (lzma.LZMAError, zlib.error) as er:
+        raise ValueError(f'Cache is broken: {er!r}') from er
+    parse_wav(data)
+    return data
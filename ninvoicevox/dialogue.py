@@ -0,0 +1,149 @@
+'''
+Dialogue of several speakers.
+All the lines are synthesized concurrently by the servers,
+and they are played or rendered in order.
+
+>>> from ninvoicevox import Dialogue
+>>> dialogue = Dialogue([
+...     (3, 'こんにちは、ずんだもんなのだ。'),
+...     (2, 'こんにちは、四国めたんです。', {'speed_scale': 1.2}, 0.8),
+...     (3, '今日もよろしくなのだ。'),
+... ], urls=['http://localhost:50021', 'http://otherhost:50021'])
+>>> dialogue.render(open('dialogue.wav', 'wb'))  # doctest: +SKIP
+'''
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from copy import copy
+from queue import Queue
+from typing import (BinaryIO, Dict, Iterable, Iterator, List, Optional,
+                    Tuple, Union)
+from .player import PersistentPlayer, Player, get_player
+from .voice import Speaker, Voice
+from .wav import WavInfo, join_wav, make_wav, parse_wav, silence
+
+Line = namedtuple('Line', ('speaker_id', 'text', 'params', 'pause'),
+                  defaults=({}, 0.4))
+Line.__doc__ = '''
+A line of dialogue.
+
+speaker_id: int
+    ID of voice.
+text: str
+    Text to read.
+params: dict
+    Attributes of Speaker for this line, like {'speed_scale': 1.2}.
+pause: float
+    Seconds of silence after this line.
+'''
+
+
+class Dialogue:
+    '''
+    Lines of several speakers.
+
+    lines: Iterable[tuple]
+        Lines, which are Line or tuple of arguments of Line.
+    speaker: Optional[Speaker]
+        Speaker whose attributes are used for all the lines,
+        like enable_cache and directory.
+    urls: Optional[List[str]]
+        URLs of servers. Each line is sent to a server which is free.
+        If None, url of speaker is used.
+    per_engine: int
+        Number of lines sent to a server at once.
+    '''
+
+    def __init__(self, lines: Iterable[tuple],
+                 speaker: Optional[Speaker] = None,
+                 urls: Optional[List[str]] = None,
+                 per_engine: int = 2):
+        self.lines = [Line(*line) for line in lines]
+        self.speaker = speaker if speaker is not None\
+            else Speaker(preload=False)
+        self.urls = urls or [self.speaker.url]
+        self.per_engine = per_engine
+
+    def _speaker(self, line: Line, url: str) -> Speaker:
+        speaker = copy(self.speaker)
+        speaker.speaker_id = line.speaker_id
+        speaker.url = url
+        speaker.preload = False
+        speaker.parallel = False
+        for key, value in line.params.items():
+            setattr(speaker, key, value)
+        return speaker
+
+    def _synthesize(self, line: Line, engines: Queue) -> bytes:
+        url = engines.get()
+        try:
+            return Voice(line.text, self._speaker(line, url),
+                         self.speaker.logger).get()
+        finally:
+            engines.put(url)
+
+    def fragments(self) -> Iterator[Tuple[WavInfo, memoryview, float]]:
+        '''
+        Yield format, PCM and pause after it of each line in order.
+        All the lines are sent to servers at once.
+        Lines of the same voice, text and params are synthesized once.
+        '''
+        engines: Queue = Queue()
+        for url in self.urls * self.per_engine:
+            engines.put(url)
+        with ThreadPoolExecutor(len(self.urls) * self.per_engine) as pool:
+            keys = [(line.speaker_id, line.text,
+                     tuple(sorted(line.params.items())))
+                    for line in self.lines]
+            shared: Dict[tuple, Future] = {}
+            for key, line in zip(keys, self.lines):
+                if key not in shared:
+                    shared[key] = pool.submit(self._synthesize, line,
+                                              engines)
+            futures: List[Future] = [shared[key] for key in keys]
+            try:
+                for line, future in zip(self.lines, futures):
+                    sound = future.result()
+                    info = parse_wav(sound)
+                    yield info, memoryview(sound)[
+                        info.offset:info.offset + info.length], line.pause
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def render(self, output: Optional[BinaryIO] = None) -> Optional[bytes]:
+        '''
+        Join lines into one WAV with pauses.
+        Format of voices must be the same, and so
+        output_sampling_rate and output_stereo should not be in params.
+
+        output: Optional[BinaryIO]
+            If it is None, WAV is returned.
+            Otherwise, WAV is written to output as soon as each line
+            is got. See wav.join_wav.
+        '''
+        def parts():
+            pause = 0.0
+            for info, pcm, next_pause in self.fragments():
+                yield info, pcm, pause
+                pause = next_pause
+        return join_wav(parts(), output)
+
+    def speak(self, player: Union[Player, List[str], None] = None) -> None:
+        '''
+        Play lines in order while following lines are synthesized.
+
+        player: Union[Player, List[str], None]
+            If None, PersistentPlayer is used to play without gap.
+            Command like ['aplay'] is also accepted like Voice.speak.
+        '''
+        own = player is None
+        player = PersistentPlayer() if player is None else get_player(player)
+        try:
+            for info, pcm, pause in self.fragments():
+                player.play(make_wav(
+                    b''.join((pcm, silence(pause, info.rate, info.channels,
+                                           info.width))),
+                    info.rate, info.channels, info.width))
+        finally:
+            if own:
+                player.close()
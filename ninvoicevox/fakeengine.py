@@ -0,0 +1,268 @@
+'''
+Stand-in of voicevox engine for benchmarks.
+It does not read text at all. It returns WAV of sine wave whose length
+is proportional to the text, with silence of prePhonemeLength and
+postPhonemeLength like the real engine.
+
+>>> from ninvoicevox import Speaker
+>>> from ninvoicevox.fakeengine import FakeEngine
+>>> with FakeEngine(latency=0.01) as engine:
+...     wav = Speaker(url=engine.url).text('こんにちは。').get()
+>>> wav[:4]
+b'RIFF'
+'''
+import json
+import math
+import random
+import time
+import uuid
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+from .voice import PART_OF_SPEECH, WORD_TYPES
+from .wav import make_wav
+
+DEFAULT_RATE = 24000
+SPEAKERS = [{
+    'name': 'ずんだもん',
+    'speaker_uuid': '388f246b-8c41-4ac1-8e2d-5d79f3ff56d9',
+    'styles': [{'name': 'ノーマル', 'id': 3},
+               {'name': 'あまあま', 'id': 1}],
+    'version': 'fake',
+}]
+
+
+def tone(seconds: float, rate: int = DEFAULT_RATE,
+         frequency: float = 440.0, amplitude: int = 8000) -> array:
+    '''
+    Make 16 bit mono PCM of sine wave.
+    One period is made and repeated.
+    '''
+    period = max(1, int(rate / frequency))
+    wave = array('h', (int(amplitude * math.sin(2 * math.pi * n / period))
+                       for n in range(period)))
+    samples = int(seconds * rate)
+    return (wave * (samples // period + 1))[:samples]
+
+
+class FakeEngine:
+    '''
+    Local http server which behaves like voicevox engine.
+    It implements speakers, audio_query, synthesis, user_dict
+    and initialize_speaker.
+
+    latency: float
+        Seconds to wait before each response.
+    synthesis_latency: Optional[float]
+        Seconds to wait before response of synthesis.
+        If None, latency is used.
+    seconds_per_char: float
+        Length of voice for a character of text.
+    init_latency: float
+        Seconds to load model of a voice. It is spent by the first
+        synthesis or initialize_speaker of each voice.
+    cancellable: bool
+        Enable cancellable_synthesis.
+    tail_ratio: float
+        Ratio of synthesis which is late by tail_latency,
+        to imitate tail latency of busy server.
+    tail_latency: float
+        Seconds added to late synthesis.
+    port: int
+        Port to listen. If 0, free port is used.
+    '''
+
+    def __init__(self, latency: float = 0.0,
+                 synthesis_latency: Optional[float] = None,
+                 seconds_per_char: float = 0.1,
+                 init_latency: float = 0.0,
+                 cancellable: bool = False,
+                 tail_ratio: float = 0.0,
+                 tail_latency: float = 1.0,
+                 port: int = 0):
+        self.latency = latency
+        self.synthesis_latency = synthesis_latency
+        self.seconds_per_char = seconds_per_char
+        self.init_latency = init_latency
+        self.initialized: Dict[int, Lock] = {}
+        self.lock = Lock()
+        self.cancellable = cancellable
+        self.tail_ratio = tail_ratio
+        self.tail_latency = tail_latency
+        self.random = random.Random(0)
+        self.user_dict: Dict[str, dict] = {}
+        self.counts: Dict[str, int] = {}
+        self.server = _Server(('127.0.0.1', port), _make_handler(self))
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def start(self) -> 'FakeEngine':
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'FakeEngine':
+        return self.start()
+
+    def __exit__(self, i, j, k) -> None:
+        self.stop()
+
+    def initialize(self, speaker: int) -> None:
+        '''
+        Load model of the voice if it is not loaded.
+        '''
+        with self.lock:
+            lock = self.initialized.get(speaker)
+            if lock is None:
+                lock = self.initialized[speaker] = Lock()
+                lock.acquire()
+                loading = True
+            else:
+                loading = False
+        if loading:
+            time.sleep(self.init_latency)
+            lock.release()
+        else:
+            with lock:
+                pass
+
+    def audio_query(self, text: str, speaker: int) -> dict:
+        return {
+            'accent_phrases': [], 'kana': text, 'text': text,
+            'speedScale': 1.0, 'pitchScale': 0.0,
+            'intonationScale': 1.0, 'volumeScale': 1.0,
+            'prePhonemeLength': 0.1, 'postPhonemeLength': 0.1,
+            'outputSamplingRate': DEFAULT_RATE, 'outputStereo': False,
+        }
+
+    def synthesis(self, query: dict, speaker: int) -> bytes:
+        self.initialize(speaker)
+        rate = int(query.get('outputSamplingRate') or DEFAULT_RATE)
+        seconds = len(query.get('text', query.get('kana', '')))\
+            * self.seconds_per_char / float(query.get('speedScale', 1.0))
+        pcm = array('h', bytes(2 * int(query['prePhonemeLength'] * rate)))
+        pcm += tone(seconds, rate)
+        pcm += array('h', bytes(2 * int(query['postPhonemeLength'] * rate)))
+        channels = 1
+        if query.get('outputStereo'):
+            stereo = array('h', bytes(4 * len(pcm)))
+            stereo[0::2] = pcm
+            stereo[1::2] = pcm
+            pcm, channels = stereo, 2
+        return make_wav(pcm.tobytes(), rate, channels)
+
+
+class _Server(ThreadingHTTPServer):
+    # Many requests come at once from Speaker.map and Progress.
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address) -> None:
+        # Client may close connection to cancel request.
+        pass
+
+
+def _make_handler(engine: FakeEngine) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _reply(self, body: bytes = b'', status: int = 200,
+                   content_type: str = 'application/json') -> None:
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _parse(self):
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            api = url.path.strip('/')
+            engine.counts[api.split('/')[0]] = \
+                engine.counts.get(api.split('/')[0], 0) + 1
+            synthesis = api in ('synthesis', 'cancellable_synthesis')
+            if synthesis and engine.synthesis_latency is not None:
+                time.sleep(engine.synthesis_latency)
+            elif engine.latency:
+                time.sleep(engine.latency)
+            if synthesis and engine.random.random() < engine.tail_ratio:
+                time.sleep(engine.tail_latency)
+            return api, query, body
+
+        def do_GET(self) -> None:
+            api, query, body = self._parse()
+            if api == 'speakers':
+                self._reply(json.dumps(SPEAKERS).encode())
+            elif api == 'user_dict':
+                self._reply(json.dumps(engine.user_dict).encode())
+            elif api == 'is_initialized_speaker':
+                self._reply(json.dumps(
+                    int(query['speaker']) in engine.initialized).encode())
+            else:
+                self._reply(b'{}', 404)
+
+        def do_POST(self) -> None:
+            api, query, body = self._parse()
+            if api == 'audio_query':
+                self._reply(json.dumps(engine.audio_query(
+                    query['text'], int(query['speaker']))).encode())
+            elif api == 'synthesis' or (api == 'cancellable_synthesis'
+                                        and engine.cancellable):
+                self._reply(engine.synthesis(json.loads(body),
+                                             int(query['speaker'])),
+                            content_type='audio/wav')
+            elif api == 'user_dict_word':
+                word_id = str(uuid.uuid4())
+                engine.user_dict[word_id] = _word(query)
+                self._reply(json.dumps(word_id).encode())
+            elif api == 'initialize_speaker':
+                engine.initialize(int(query['speaker']))
+                self._reply(status=204)
+            elif api == 'import_user_dict':
+                words = json.loads(body)
+                if query.get('override') != 'true':
+                    for word_id in engine.user_dict:
+                        words.pop(word_id, None)
+                engine.user_dict.update(words)
+                self._reply(status=204)
+            else:
+                self._reply(b'{}', 404)
+
+        def do_PUT(self) -> None:
+            api, query, body = self._parse()
+            word_id = api.split('/')[-1]
+            if api.startswith('user_dict_word/')\
+                    and word_id in engine.user_dict:
+                engine.user_dict[word_id] = _word(query)
+                self._reply(status=204)
+            else:
+                self._reply(b'{}', 404)
+
+        def do_DELETE(self) -> None:
+            api, query, body = self._parse()
+            word_id = api.split('/')[-1]
+            if engine.user_dict.pop(word_id, None) is not None:
+                self._reply(status=204)
+            else:
+                self._reply(b'{}', 404)
+    return Handler
+
+
+def _word(query: dict) -> dict:
+    word = {'surface': query['surface'],
+            'pronunciation': query['pronunciation'],
+            'accent_type': int(query['accent_type']),
+            'priority': int(query.get('priority', 5))}
+    word.update(zip(PART_OF_SPEECH,
+                    WORD_TYPES[query.get('word_type', 'PROPER_NOUN')]))
+    return word
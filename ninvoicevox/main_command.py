@@ -1,5 +1,11 @@
 from argparse import ArgumentParser
-from .voice import Speaker, get_speaker_info, AsyncQueue
+from .voice import (Speaker, get_speaker_info, AsyncQueue, Dictionary,
+                    load_words)
+from .metrics import metrics
+from .wav import Processor
+from .cache import CacheFormat
+from .player import PersistentPlayer, UNIX_SOUND_PLAYER
+from .terms import Normalizer, ZUNDA_RULES, READING_RULES
 import sys
 import shutil
 
@@ -16,6 +22,12 @@ parser.add_argument('text', nargs='?', default='')
 parser.add_argument('-c', '--cache', action='store_true',
                     help='Enable disk cache.'
                     'Cache is saved in directory named by -p option.')
+parser.add_argument('--compress', choices=('zlib', 'lzma'), default=None,
+                    help='Compress disk cache.')
+parser.add_argument('--cache_mono', action='store_true',
+                    help='Save disk cache in mono.')
+parser.add_argument('--cache_rate', type=int, default=0,
+                    help='Sampling rate of disk cache in mono.')
 parser.add_argument('-d', '--delete_cache', action='store_true',
                     help='Delete cache and close.')
 parser.add_argument('-u', '--url', type=str, default="http://localhost:50021",
@@ -35,17 +47,84 @@ parser.add_argument('-n', '--name', nargs='?', default='ノーマル',
 parser.add_argument('-a', '--speed_scale', type=float, default=1.0,
                     help='Set speed.')
 parser.add_argument('-S', '--stdout', action='store_true',
-                    help='Show list of speakers and exit.')
+                    help='Write one WAV to stdout instead of playing.')
+parser.add_argument('-o', '--output', default=None,
+                    help='Write one WAV to the file instead of playing.')
+parser.add_argument('-r', '--resume', action='store_true',
+                    help='With -o, record progress next to the file and '
+                    'resume from it if it was stopped.')
+parser.add_argument('-P', '--player', choices=('aplay', 'persistent'),
+                    default='aplay',
+                    help='aplay starts aplay for each sentence. '
+                    'persistent keeps one aplay and plays without gap.')
+parser.add_argument('--warmup', action='store_true',
+                    help='Load model of the voice on server in background.')
 parser.add_argument('--zundamon', action='store_true',
                     help='Speak in zundamon style.')
+parser.add_argument('--normalize', action='store_true',
+                    help='Read dates, times and numbers, '
+                    'and skip URLs, hashes and lines of symbols.')
+parser.add_argument('--trim', action='store_true',
+                    help='Trim silence at the start and the end of voices.')
+parser.add_argument('--loudness', type=float, default=None,
+                    help='Normalize loudness of voices to this dBFS.')
+parser.add_argument('--metrics', default=None,
+                    help='Write time spent in each stage to the file. '
+                    'It is json if it ends with .json, '
+                    'otherwise prometheus text format.')
+parser.add_argument('-e', '--engines', nargs='*', default=[],
+                    help='URLs of other servers to use with -u.')
+parser.add_argument('--sync_dict', default=None,
+                    help='Make user dictionary of servers same as '
+                    'the word list file (csv or json) and exit.')
+parser.add_argument('--keep_words', action='store_true',
+                    help='Do not delete words which are not in the list '
+                    'by --sync_dict.')
+parser.add_argument('-m', '--markup', action='store_true',
+                    help='Read markup like [pause=500] and '
+                    '[speed=1.3]...[/speed] in the text.')
 args = parser.parse_args()
 
 
+class _Watched:
+    '''
+    Stream which remembers whether something is written to it.
+    '''
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.written = False
+
+    def write(self, data: bytes) -> int:
+        self.written = True
+        return self.stream.write(data)
+
+    def __getattr__(self, name: str):
+        return getattr(self.stream, name)
+
+
 def main() -> None:
+    if args.resume and not args.output:
+        parser.error('-r/--resume needs -o/--output.')
+    if args.resume and args.markup:
+        parser.error('-r/--resume can not be used with -m/--markup.')
     text = args.text if args.text or sys.stdin.isatty() else sys.stdin.read()
+    rules = []
     if args.zundamon:
-        from .terms import change_style
-        text = change_style(text)
+        rules += ZUNDA_RULES
+    if args.normalize:
+        rules += READING_RULES
+    if args.sync_dict:
+        dictionary = Dictionary(args.url, cache_directories=[args.cache_path])
+        try:
+            words = load_words(args.sync_dict)
+        except ValueError as er:
+            parser.error(str(er))
+        result = dictionary.sync(words, [args.url] + args.engines,
+                                 prune=not args.keep_words)
+        for url, count in result.items():
+            print(f'{url}: {count}')
+        return None
     if args.delete_cache:
         shutil.rmtree(Speaker('', preload=False).directory)
         return None
@@ -72,14 +151,41 @@ def main() -> None:
         speed_scale=args.speed_scale,
         directory=args.cache_path,
         url=args.url,
-        parallel=True
+        parallel=True,
+        warmup=args.warmup,
+        normalizer=Normalizer(rules) if rules else None,
+        postprocess=Processor(args.trim, loudness=args.loudness)
+        if args.trim or args.loudness is not None else None,
+        cache_format=CacheFormat(args.compress, args.cache_mono,
+                                 args.cache_rate)
+        if args.compress or args.cache_mono or args.cache_rate else None
     )
+    player = PersistentPlayer() if args.player == 'persistent'\
+        else UNIX_SOUND_PLAYER
+    output = _Watched(sys.stdout.buffer) if args.stdout else None
+    error = None
     count = 0
     while could_speak is False and count < 5:
-        option = [None] if args.stdout else []
         try:
-            speaker.text(text).speak(*option)
+            voice = speaker.markup(text, [args.url] + args.engines)\
+                if args.markup else speaker.text(text)
+            if args.resume:
+                voice.render_file(args.output)
+            elif args.output:
+                with open(args.output, 'wb') as fp:
+                    voice.render(fp)
+            elif args.stdout:
+                voice.render(output)
+            else:
+                voice.speak(player)
             could_speak = True
-        except * Exception as er:
-            could_speak = False
+        except Exception as er:
+            error = er
             count += 1
+            # Another WAV must not be written after the broken one.
+            if output is not None and output.written:
+                break
+    if args.metrics:
+        metrics.dump(args.metrics)
+    if not could_speak:
+        parser.exit(1, f'ninvoice: {error!r}\n')
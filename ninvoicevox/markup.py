@@ -0,0 +1,89 @@
+'''
+Inline markup of pauses and prosody.
+Text is split into lines of Dialogue, and so it is synthesized
+concurrently. Pauses are silence made here without asking voicevox,
+and lines of the same text and attributes share one voice and
+one cache file.
+
+[pause=500]
+    Silence of 500 ms.
+[speed=1.3]...[/speed]
+    speed_scale of the span. pitch, intonation and volume are also
+    available, and they can be nested.
+[speaker=2]...[/speaker]
+    ID of voice of the span.
+
+>>> lines = parse_markup('はじめます。[pause=800][speed=1.5]早口です。[/speed]')
+>>> [(line.text, line.params, line.pause) for line in lines]
+[('はじめます。', {}, 0.8), ('早口です。', {'speed_scale': 1.5}, 0.4)]
+'''
+import re
+from typing import Dict, List
+from .dialogue import Line
+
+TAG = re.compile(r'\[(/?)(pause|speed|pitch|intonation|volume|speaker)'
+                 r'(?:=([-+]?[0-9.]+))?\]')
+ATTRIBUTES = {'speed': 'speed_scale', 'pitch': 'pitch_scale',
+              'intonation': 'intonation_scale', 'volume': 'volume_scale'}
+PUNCTUATIONS = '。、！？!?\n'
+SENTENCE = re.compile(f'[^{PUNCTUATIONS}]*[{PUNCTUATIONS}]*')
+
+
+def parse_markup(text: str, speaker_id: int = 1,
+                 sep: float = 0.4) -> List[Line]:
+    '''
+    Parse markup into lines.
+    Text is split at punctuations, and there is sep seconds of silence
+    after a punctuation. A pause at the start of text is ignored.
+
+    text: str
+        Text with markup.
+    speaker_id: int
+        ID of voice out of [speaker=...].
+    sep: float
+        Seconds of silence after punctuations.
+    '''
+    lines: List[Line] = []
+    stacks: Dict[str, List[str]] = {}
+    # Pause of the last line is given by [pause=...].
+    explicit = False
+    position = 0
+    while position <= len(text):
+        match = TAG.search(text, position)
+        end = len(text) if match is None else match.start()
+        for sentence in SENTENCE.findall(text, position, end):
+            words = sentence.strip(PUNCTUATIONS + ' 　')
+            pause = sep if sentence[-1:] in tuple(PUNCTUATIONS) else 0.0
+            if words:
+                speakers = stacks.get('speaker')
+                lines.append(Line(
+                    int(speakers[-1]) if speakers else speaker_id,
+                    sentence.rstrip('\n'),
+                    {ATTRIBUTES[name]: float(values[-1])
+                     for name, values in stacks.items()
+                     if values and name in ATTRIBUTES},
+                    pause))
+                explicit = False
+            elif pause and lines and not explicit:
+                lines[-1] = lines[-1]._replace(pause=pause)
+        if match is None:
+            break
+        position = match.end()
+        close, name, value = match.groups()
+        if name == 'pause':
+            if value is None or close:
+                raise ValueError(f'Pause needs milliseconds: {match[0]}')
+            if lines:
+                before = lines[-1].pause if explicit else 0.0
+                lines[-1] = lines[-1]._replace(
+                    pause=before + float(value) / 1000)
+                explicit = True
+        elif close:
+            if not stacks.get(name):
+                raise ValueError(f'{match[0]} is not opened.')
+            stacks[name].pop()
+        else:
+            if value is None:
+                raise ValueError(f'Value is needed: {match[0]}')
+            stacks.setdefault(name, []).append(value)
+    return lines
@@ -0,0 +1,145 @@
+'''
+Timing of each stage of ninvoicevox.
+Stages are recorded by name and labels, and they can be
+received by callbacks or dumped as json or prometheus text.
+
+>>> from ninvoicevox.metrics import Metrics
+>>> metrics = Metrics()
+>>> _ = metrics.add_callback(lambda name, value, labels: None)
+>>> with metrics.timer('synthesis_seconds'):
+...     pass
+>>> metrics.summary()['synthesis_seconds']['count']
+1
+
+Names recorded by ninvoicevox are below.
+
+cache_lookup_seconds (cache='hit' or 'miss')
+audio_query_seconds
+synthesis_seconds
+hedge_wins (1 if a hedged request answered first, or 0)
+received_bytes
+postprocess_seconds
+receive_seconds (cache='hit', 'miss' or 'disabled')
+first_receive_seconds (cache and warmup='true' or 'false')
+warmup_seconds (initialized='true' or 'false')
+prefetch_hits (1 if Speaker.text used a prefetched voice, or 0)
+queue_wait_seconds
+template_slot_seconds (cache='hit' or 'miss')
+player_spawn_seconds
+playback_seconds
+'''
+import json
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+Callback = Callable[[str, float, Dict[str, str]], Any]
+
+
+class Metrics:
+    '''
+    Recorder of timing.
+    Only count, sum, min and max are kept,
+    so it does not grow by number of records.
+    '''
+
+    def __init__(self) -> None:
+        self.callbacks: List[Callback] = []
+        self.values: Dict[Tuple[str, tuple], List[float]] = {}
+        self.lock = Lock()
+
+    def __deepcopy__(self, memo: dict) -> 'Metrics':
+        # Recorder is shared by copies of Speaker.
+        return self
+
+    def add_callback(self, callback: Callback) -> 'Metrics':
+        '''
+        Add function called as callback(name, value, labels)
+        on every record.
+        '''
+        self.callbacks.append(callback)
+        return self
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        '''
+        Record a value.
+        '''
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            stat = self.values.get(key)
+            if stat is None:
+                self.values[key] = [1, value, value, value]
+            else:
+                stat[0] += 1
+                stat[1] += value
+                stat[2] = min(stat[2], value)
+                stat[3] = max(stat[3], value)
+        for callback in self.callbacks:
+            callback(name, value, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[Dict[str, str]]:
+        '''
+        Record seconds spent in with statement.
+        Labels can be changed in with statement by yielded dict.
+        '''
+        t = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(name, time.perf_counter() - t, **labels)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.values.clear()
+
+    def summary(self) -> Dict[str, Any]:
+        '''
+        Statistics by name.
+        If there are labels, it is nested by labels like
+        {'receive_seconds': {'cache=hit': {...}}}.
+        '''
+        result: Dict[str, Any] = {}
+        with self.lock:
+            items = [(key, list(stat)) for key, stat in self.values.items()]
+        for (name, labels), (count, total, low, high) in items:
+            stat = dict(count=count, sum=total, min=low, max=high,
+                        mean=total / count)
+            if labels:
+                label = ','.join(f'{k}={v}' for k, v in labels)
+                result.setdefault(name, {})[label] = stat
+            else:
+                result[name] = stat
+        return result
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), indent=2)
+
+    def to_prometheus(self, prefix: str = 'ninvoice_') -> str:
+        '''
+        Prometheus text format of count and sum.
+        '''
+        lines = []
+        with self.lock:
+            items = [(key, list(stat)) for key, stat in self.values.items()]
+        for (name, labels), (count, total, _, _) in sorted(items):
+            label = ','.join(f'{k}="{v}"' for k, v in labels)
+            label = '{' + label + '}' if label else ''
+            lines.append(f'{prefix}{name}_count{label} {count}')
+            lines.append(f'{prefix}{name}_sum{label} {total}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path: str) -> None:
+        '''
+        Write metrics to file.
+        If name of the file ends with '.json', it is json.
+        Otherwise, it is prometheus text format.
+        '''
+        with open(path, 'w') as fp:
+            fp.write(self.to_json() if str(path).endswith('.json')
+                     else self.to_prometheus())
+
+
+# Default recorder used by ninvoicevox.
+metrics = Metrics()
@@ -0,0 +1,216 @@
+'''
+Many fixed phrases in one buffer.
+Voice object for each phrase has a thread, a dict of query and its own
+bytes. PhraseBank keeps PCM of all the phrases in one buffer with
+arrays of offsets, and plays them without copy.
+It can be saved as a WAV file with index, and the file is mapped to
+memory when it is opened, so loading is not needed at startup.
+
+>>> from ninvoicevox import Speaker, PhraseBank
+>>> bank = PhraseBank.load(Speaker(), {  # doctest: +SKIP
+...     'start': '処理が始まりました。', 'end': '処理が終わりました。'})
+>>> bank.speak('start')  # doctest: +SKIP
+>>> bank.save('phrases.wav')  # doctest: +SKIP
+>>> bank = PhraseBank.open('phrases.wav')  # doctest: +SKIP
+'''
+import json
+import mmap
+import struct
+from array import array
+from tempfile import TemporaryFile
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from .metrics import Metrics, metrics
+from .player import Player, UNIX_SOUND_PLAYER, get_player
+from .voice import Speaker
+from .wav import WavInfo, make_header, make_wav, parse_wav
+
+# Chunk of index put after data chunk of WAV.
+INDEX_CHUNK = b'nvpb'
+
+
+class PhraseBank:
+    '''
+    Store of phrases by key.
+    Views got by [] must be released before add, since buffer can not
+    be resized while it is viewed.
+
+    metrics: Metrics
+        Recorder given to players.
+    '''
+    __slots__ = ('index', 'offsets', 'lengths', 'buffer', 'format',
+                 'metrics', '_mmap')
+
+    def __init__(self, metrics: Metrics = metrics):
+        self.index: Dict[str, int] = {}
+        self.offsets = array('Q')
+        self.lengths = array('Q')
+        self.buffer: Union[bytearray, memoryview] = bytearray()
+        self.format: Optional[Tuple[int, int, int]] = None
+        self.metrics = metrics
+        self._mmap: Optional[mmap.mmap] = None
+
+    @classmethod
+    def load(cls, speaker: Speaker,
+             phrases: Union[Dict[str, str], Iterable[str]],
+             concurrency: int = 8) -> 'PhraseBank':
+        '''
+        Get phrases from voicevox concurrently by Speaker.map.
+        The bank is mapped to a temporary file and can not be changed.
+
+        speaker: Speaker
+            Speaker to read. Cache of it is used.
+        phrases: Union[Dict[str, str], Iterable[str]]
+            Dict of key and text. If it is not dict, text is the key.
+        concurrency: int
+            Number of requests sent at once.
+        '''
+        bank = cls(speaker.metrics)
+        if not isinstance(phrases, dict):
+            phrases = {text: text for text in phrases}
+        keys: Dict[str, List[str]] = {}
+        for key, text in phrases.items():
+            keys.setdefault(text, []).append(key)
+        # PCM is spooled to a file and mapped, so that growing buffer
+        # does not keep spare memory.
+        with TemporaryFile() as fp:
+            for text, wav in speaker.map(keys, concurrency, ordered=False):
+                info = bank._check(wav)
+                bank._append(keys[text], fp.tell(), info.length)
+                fp.write(memoryview(wav)[info.offset:
+                                         info.offset + info.length])
+            fp.flush()
+            if fp.tell():
+                bank._map(mmap.mmap(fp.fileno(), 0,
+                                    access=mmap.ACCESS_READ),
+                          0, fp.tell())
+        return bank
+
+    def _check(self, wav: bytes) -> WavInfo:
+        info = parse_wav(wav)
+        if self.format is None:
+            self.format = tuple(info[:3])
+        elif tuple(info[:3]) != self.format:
+            raise ValueError('Format of voices are different.')
+        return info
+
+    def _append(self, keys: Union[str, List[str]], offset: int,
+                length: int) -> None:
+        slot = len(self.offsets)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        for key in [keys] if isinstance(keys, str) else keys:
+            self.index[key] = slot
+
+    def _map(self, mapped: mmap.mmap, offset: int, length: int) -> None:
+        self._mmap = mapped
+        self.buffer = memoryview(mapped)[offset:offset + length]
+
+    def add(self, keys: Union[str, List[str]], wav: bytes) -> None:
+        '''
+        Add WAV of the phrase by keys.
+        '''
+        if not isinstance(self.buffer, bytearray):
+            raise ValueError('Mapped PhraseBank can not be changed.')
+        info = self._check(wav)
+        self._append(keys, len(self.buffer), info.length)
+        self.buffer += memoryview(wav)[info.offset:info.offset + info.length]
+
+    def __getitem__(self, key: str) -> memoryview:
+        '''
+        PCM of the phrase. It is not copied.
+        '''
+        slot = self.index[key]
+        offset = self.offsets[slot]
+        return memoryview(self.buffer)[offset:offset + self.lengths[slot]]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def keys(self) -> Iterable[str]:
+        return self.index.keys()
+
+    def info(self, key: str) -> WavInfo:
+        rate, channels, width = self.format
+        return WavInfo(rate, channels, width, 0,
+                       self.lengths[self.index[key]])
+
+    def wav(self, key: str) -> bytes:
+        '''
+        WAV of the phrase. It is a copy.
+        '''
+        return make_wav(self[key], *self.format)
+
+    def speak(self, key: str,
+              command: List[str] | None | Player = UNIX_SOUND_PLAYER
+              ) -> None:
+        '''
+        Play the phrase. See Voice.speak.
+        '''
+        get_player(command, self.metrics).play_pcm(self.info(key), self[key])
+
+    def save(self, path: str) -> None:
+        '''
+        Save as WAV which has all the phrases in order and index of them.
+        '''
+        rate, channels, width = self.format
+        index = json.dumps(dict(
+            keys=self.index,
+            slots=list(zip(self.offsets, self.lengths))),
+            ensure_ascii=False).encode()
+        pad = b'\0' * (len(self.buffer) % 2)
+        header = bytearray(make_header(rate, channels, len(self.buffer),
+                                       width))
+        # RIFF size includes the index chunk.
+        struct.pack_into('<I', header, 4, len(header) - 8
+                         + len(self.buffer) + len(pad) + 8 + len(index))
+        with open(path, 'wb') as fp:
+            fp.write(header)
+            fp.write(self.buffer)
+            fp.write(pad)
+            fp.write(struct.pack('<4sI', INDEX_CHUNK, len(index)))
+            fp.write(index)
+
+    @classmethod
+    def open(cls, path: str, metrics: Metrics = metrics) -> 'PhraseBank':
+        '''
+        Map file saved by save to memory.
+        PCM is read from the file when it is played.
+        '''
+        with open(path, 'rb') as fp:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        info = parse_wav(mapped)
+        position = info.offset + info.length + info.length % 2
+        chunk, size = struct.unpack_from('<4sI', mapped, position)\
+            if position + 8 <= len(mapped) else (None, 0)
+        if chunk != INDEX_CHUNK:
+            mapped.close()
+            raise ValueError('It is not PhraseBank.')
+        index = json.loads(mapped[position + 8:position + 8 + size])
+        bank = cls(metrics)
+        bank.format = tuple(info[:3])
+        for offset, length in index['slots']:
+            bank.offsets.append(offset)
+            bank.lengths.append(length)
+        bank.index = index['keys']
+        bank._map(mapped, info.offset, info.length)
+        return bank
+
+    def close(self) -> None:
+        '''
+        Unmap the file. Views got by [] must be released before it.
+        It does nothing to bank in memory.
+        '''
+        if self._mmap is not None:
+            self.buffer.release()
+            self._mmap.close()
+            self._mmap = None
+            self.buffer = bytearray()
+
+    def __enter__(self) -> 'PhraseBank':
+        return self
+
+    def __exit__(self, i, j, k) -> None:
+        self.close()
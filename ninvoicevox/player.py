@@ -0,0 +1,324 @@
+'''
+Players of voice.
+CommandPlayer starts a player program for each voice, which is
+what Voice.speak did. PersistentPlayer keeps one player program and
+streams PCM into it, so there is no gap to start the program
+and to open the sound device.
+
+>>> from ninvoicevox import Speaker
+>>> from ninvoicevox.player import PersistentPlayer
+>>> with PersistentPlayer() as player:
+...     Speaker().text('こんにちは。').speak(player)  # doctest: +SKIP
+'''
+import atexit
+import os
+import sys
+import time
+from subprocess import DEVNULL, PIPE, Popen
+from threading import Lock
+from typing import BinaryIO, Callable, List, Optional, Union
+from weakref import WeakSet
+from .metrics import Metrics, metrics
+from .wav import WavInfo, make_header, make_wav, parse_wav
+if os.name == 'nt':
+    import winsound
+
+UNIX_SOUND_PLAYER = ['aplay']
+
+
+def send_file(output: int, source: int, offset: int, count: int) -> None:
+    '''
+    Copy a part of file to output like pipe in kernel by os.sendfile.
+    If it is not supported, like on windows or to pipe on macOS,
+    the file is read and written by chunks.
+    '''
+    started = False
+    try:
+        while count > 0:
+            sent = os.sendfile(output, source, offset, count)
+            if not sent:
+                return None
+            started = True
+            offset += sent
+            count -= sent
+        return None
+    except (AttributeError, OSError):
+        if started:
+            raise
+    os.lseek(source, offset, os.SEEK_SET)
+    while count > 0:
+        chunk = os.read(source, min(count, 1 << 16))
+        if not chunk:
+            break
+        count -= len(chunk)
+        with memoryview(chunk) as view:
+            while view:
+                view = view[os.write(output, view):]
+
+
+def aplay_raw(info: WavInfo) -> List[str]:
+    '''
+    Command of aplay to play raw PCM of the format.
+    '''
+    return ['aplay', '-q', '-t', 'raw', '-f', f'S{info.width * 8}_LE',
+            '-r', str(info.rate), '-c', str(info.channels)]
+
+
+class Player:
+    '''
+    Base class of players.
+    '''
+    metrics: Metrics = metrics
+
+    def play(self, wav: bytes) -> None:
+        raise NotImplementedError
+
+    def play_pcm(self, info: WavInfo, pcm: memoryview) -> None:
+        '''
+        Play PCM of the format.
+        Players which can write PCM as it is override it to avoid copy.
+        '''
+        self.play(make_wav(pcm, info.rate, info.channels, info.width))
+
+    def play_file(self, path: str) -> None:
+        '''
+        Play WAV file.
+        Players which can send the file to the program override it.
+        '''
+        with open(path, 'rb') as fp:
+            self.play(fp.read())
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'Player':
+        return self
+
+    def __exit__(self, i, j, k) -> None:
+        self.close()
+
+
+class CommandPlayer(Player):
+    '''
+    Start a program for each voice and send WAV to stdin.
+
+    command: List[str]
+        Program and options like ['aplay'].
+    '''
+
+    def __init__(self, command: List[str] = UNIX_SOUND_PLAYER,
+                 metrics: Metrics = metrics):
+        self.command = command
+        self.metrics = metrics
+
+    def play(self, wav: bytes) -> None:
+        with self.metrics.timer('player_spawn_seconds'):
+            task = Popen(self.command, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        with self.metrics.timer('playback_seconds'):
+            task.communicate(wav)
+            task.wait()
+
+    def play_pcm(self, info: WavInfo, pcm: memoryview) -> None:
+        with self.metrics.timer('player_spawn_seconds'):
+            task = Popen(self.command, stdin=PIPE, stdout=DEVNULL,
+                         stderr=DEVNULL)
+        with self.metrics.timer('playback_seconds'):
+            try:
+                task.stdin.write(make_header(info.rate, info.channels,
+                                             len(pcm), info.width))
+                task.stdin.write(pcm)
+                task.stdin.close()
+            except BrokenPipeError:
+                pass
+            task.wait()
+
+    def play_file(self, path: str) -> None:
+        with open(path, 'rb') as fp:
+            with self.metrics.timer('player_spawn_seconds'):
+                task = Popen(self.command, stdin=PIPE, stdout=DEVNULL,
+                             stderr=DEVNULL)
+            with self.metrics.timer('playback_seconds'):
+                try:
+                    send_file(task.stdin.fileno(), fp.fileno(), 0,
+                              os.fstat(fp.fileno()).st_size)
+                    task.stdin.close()
+                except BrokenPipeError:
+                    pass
+                task.wait()
+
+
+class StdoutPlayer(Player):
+    '''
+    Write WAV to stdout.
+    '''
+
+    def __init__(self, metrics: Metrics = metrics):
+        self.metrics = metrics
+
+    def play(self, wav: bytes) -> None:
+        with self.metrics.timer('playback_seconds'):
+            sys.stdout.buffer.write(wav)
+
+    def play_pcm(self, info: WavInfo, pcm: memoryview) -> None:
+        with self.metrics.timer('playback_seconds'):
+            sys.stdout.buffer.write(make_header(info.rate, info.channels,
+                                                len(pcm), info.width))
+            sys.stdout.buffer.write(pcm)
+
+    def play_file(self, path: str) -> None:
+        with open(path, 'rb') as fp,\
+                self.metrics.timer('playback_seconds'):
+            sys.stdout.buffer.flush()
+            send_file(sys.stdout.buffer.fileno(), fp.fileno(), 0,
+                      os.fstat(fp.fileno()).st_size)
+
+
+class WinsoundPlayer(Player):
+    '''
+    Play by winsound of windows.
+    '''
+
+    def __init__(self, metrics: Metrics = metrics):
+        self.metrics = metrics
+
+    def play(self, wav: bytes) -> None:
+        with self.metrics.timer('playback_seconds'):
+            winsound.PlaySound(wav, winsound.SND_MEMORY)
+
+
+class NullPlayer(Player):
+    '''
+    Play nothing. It is for benchmarks and tests.
+    '''
+
+    def play(self, wav: bytes) -> None:
+        pass
+
+    def play_pcm(self, info: WavInfo, pcm: memoryview) -> None:
+        pass
+
+    def play_file(self, path: str) -> None:
+        pass
+
+
+class PersistentPlayer(Player):
+    '''
+    Keep one player program and write PCM of voices into it.
+    The program is started again only when format of WAV is changed.
+
+    play returns a little before the end of the voice,
+    so that the next voice can be written without gap.
+
+    command: Callable[[WavInfo], List[str]]
+        Function to make command to play raw PCM of the format.
+    lead: float
+        Seconds to return before the end of the voice.
+    '''
+
+    def __init__(self, command: Callable[[WavInfo], List[str]] = aplay_raw,
+                 lead: float = 0.1, metrics: Metrics = metrics):
+        self.command = command
+        self.lead = lead
+        self.metrics = metrics
+        self.lock = Lock()
+        self.task: Optional[Popen] = None
+        self.format: Optional[tuple] = None
+        self.end_time = 0.0
+        _persistent_players.add(self)
+
+    def _open(self, info: WavInfo) -> None:
+        self.close()
+        with self.metrics.timer('player_spawn_seconds'):
+            self.task = Popen(self.command(info), stdin=PIPE,
+                              stdout=DEVNULL, stderr=DEVNULL)
+        self.format = info[:3]
+        self.end_time = 0.0
+
+    def play(self, wav: bytes) -> None:
+        info = parse_wav(wav)
+        self.play_pcm(info, memoryview(wav)[info.offset:
+                                            info.offset + info.length])
+
+    def play_pcm(self, info: WavInfo, pcm: memoryview) -> None:
+        def write(stdin: BinaryIO) -> None:
+            stdin.write(pcm)
+            stdin.flush()
+        with self.lock:
+            self._send(info, len(pcm), write)
+
+    def play_file(self, path: str) -> None:
+        '''
+        Send PCM of WAV file to the program by os.sendfile.
+        '''
+        with open(path, 'rb') as fp, self.lock:
+            size = os.fstat(fp.fileno()).st_size
+            info = parse_wav(fp.read(4096), size)
+            self._send(info, info.length, lambda stdin: send_file(
+                stdin.fileno(), fp.fileno(), info.offset, info.length))
+
+    def _send(self, info: WavInfo, length: int,
+              write: Callable[[BinaryIO], None]) -> None:
+        # If the program has died, it is started once again.
+        # The voice is dropped if it dies again like CommandPlayer.
+        with self.metrics.timer('playback_seconds'):
+            for retry in (True, False):
+                if self.task is None or self.task.poll() is not None\
+                        or self.format != info[:3]:
+                    self._open(info)
+                # Time is taken before writing, which blocks
+                # while the program plays PCM written before.
+                start = max(self.end_time, time.monotonic())
+                try:
+                    write(self.task.stdin)
+                    break
+                except BrokenPipeError:
+                    self.close()
+                    if not retry:
+                        return None
+            self._wait(start, info, length)
+
+    def _wait(self, start: float, info: WavInfo, length: int) -> None:
+        # Sleep until a little before the end of written PCM.
+        self.end_time = start + length\
+            / (info.rate * info.channels * info.width)
+        wait = self.end_time - time.monotonic() - self.lead
+        if wait > 0:
+            time.sleep(wait)
+
+    def close(self) -> None:
+        '''
+        Wait the end of voices and stop the program.
+        '''
+        if self.task is not None:
+            try:
+                self.task.stdin.close()
+            except BrokenPipeError:
+                pass
+            self.task.wait()
+            self.task = None
+
+
+_persistent_players: 'WeakSet[PersistentPlayer]' = WeakSet()
+
+
+@atexit.register
+def _close_players() -> None:
+    # One registration for all players, so that players are not kept.
+    for player in list(_persistent_players):
+        player.close()
+
+
+def get_player(command: Union[List[str], None, Player],
+               metrics: Metrics = metrics) -> Player:
+    '''
+    Make player from argument of Voice.speak.
+    If command is None, WAV is written to stdout.
+    On windows, command is ignored and winsound is used.
+    '''
+    if isinstance(command, Player):
+        return command
+    if command is None:
+        return StdoutPlayer(metrics)
+    if os.name == 'nt':
+        return WinsoundPlayer(metrics)
+    return CommandPlayer(command, metrics)
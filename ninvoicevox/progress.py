@@ -0,0 +1,183 @@
+'''
+Spoken progress of a loop.
+Messages of milestones are got from voicevox one by one in background
+before they are reached, and they are spoken by another thread.
+If a milestone is reached while the former one is spoken, only the
+latest one is spoken next, so the loop is never blocked.
+
+>>> from ninvoicevox import Speaker
+>>> speaker = Speaker()
+>>> for n in speaker.progress(range(1000), every=25):  # doctest: +SKIP
+...     heavy_task(n)
+'''
+import math
+import time
+from concurrent.futures import CancelledError
+from copy import copy
+from logging import Logger
+from threading import Condition, Event, Thread
+from typing import (Generic, Iterable, Iterator, List, Optional, Tuple,
+                    TypeVar)
+from .player import Player, UNIX_SOUND_PLAYER, get_player
+from .voice import Speaker, Voice, logger
+
+T = TypeVar('T')
+
+
+class LatestQueue:
+    '''
+    Queue which keeps only the latest item.
+    put never blocks and replaces the item which is not got yet.
+    '''
+
+    def __init__(self) -> None:
+        self.condition = Condition()
+        self.item: Optional[object] = None
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item: object) -> None:
+        with self.condition:
+            if self.item is not None:
+                self.dropped += 1
+            self.item = item
+            self.condition.notify()
+
+    def get(self) -> Optional[object]:
+        '''
+        Wait an item. None is returned after close.
+        '''
+        with self.condition:
+            while self.item is None and not self.closed:
+                self.condition.wait()
+            item, self.item = self.item, None
+            return item
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class Progress(Generic[T]):
+    '''
+    Iterator which speaks percentage of progress.
+    It is made by Speaker.progress.
+
+    iterable: Iterable[T]
+        Iterable to wrap.
+    speaker: Speaker
+        Speaker to read messages.
+    every: float
+        Percent between milestones.
+    interval: float
+        Minimum seconds between messages. Milestones reached before it
+        are skipped, except the last one.
+    total: Optional[int]
+        Number of items. If None, len(iterable) is used.
+    message: str
+        Message of milestone. {} is replaced by percent.
+    command: List[str] | None | Player
+        Player to speak. See Voice.speak.
+    '''
+
+    def __init__(self, iterable: Iterable[T], speaker: Speaker,
+                 every: float = 10, interval: float = 3.0,
+                 total: Optional[int] = None,
+                 message: str = '{}パーセント終わりました。',
+                 command: List[str] | None | Player = UNIX_SOUND_PLAYER,
+                 logger: Logger = logger):
+        if total is None:
+            try:
+                total = len(iterable)  # type: ignore
+            except TypeError:
+                raise ValueError('total is needed for iterable without len.')
+        if every <= 0:
+            raise ValueError('every must be positive.')
+        self.iterable = iterable
+        self.total = total
+        self.interval = interval
+        self.player = get_player(command, speaker.metrics)
+        self.logger = logger
+        speaker = copy(speaker)
+        speaker.preload = False
+        speaker.parallel = False
+        percents = [min(100, every * n)
+                    for n in range(1, math.ceil(100 / every) + 1)]
+        # Count of items to reach each milestone.
+        self.counts = [math.ceil(total * p / 100) for p in percents]
+        self.voices: List[Voice] = [
+            speaker.text(message.format(f'{p:g}')) for p in percents]
+        # Set when the prefetching thread finished each voice.
+        self.ready: List[Event] = [Event() for _ in percents]
+        self.queue = LatestQueue()
+        self.last = -math.inf
+        Thread(target=self._prefetch,
+               args=(list(zip(self.voices, self.ready)),),
+               daemon=True).start()
+
+    def _prefetch(self, voices: List[Tuple[Voice, Event]]) -> None:
+        # Only this thread receives voices, so that a voice is not
+        # synthesized twice when it is reached while it is received.
+        for voice, ready in voices:
+            try:
+                if not voice.cancelled():
+                    voice.get()
+            except CancelledError:
+                pass
+            except Exception as er:
+                self.logger.warning(f'Failed to receive "{voice.text}": '
+                                    f'{er!r}')
+            finally:
+                ready.set()
+
+    def _speak(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            voice, ready = item
+            ready.wait()
+            if voice.sound is None:
+                continue
+            try:
+                self.player.play(voice.sound)
+            except Exception as er:
+                self.logger.warning(f'Failed to speak progress: {er!r}')
+
+    def _reach(self, count: int) -> float:
+        '''
+        Put the latest milestone reached by count and
+        return count of the next milestone.
+        '''
+        index = -1
+        while index + 1 < len(self.counts) and self.counts[index + 1] <= count:
+            index += 1
+        final = index == len(self.counts) - 1
+        now = time.monotonic()
+        skipped = list(zip(self.voices[:index + 1], self.ready[:index + 1]))
+        if final or now - self.last >= self.interval:
+            self.last = now
+            self.queue.put(skipped.pop())
+        for voice, _ in skipped:
+            voice.cancel()
+        del self.counts[:index + 1]
+        del self.voices[:index + 1]
+        del self.ready[:index + 1]
+        return self.counts[0] if self.counts else math.inf
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __iter__(self) -> Iterator[T]:
+        thread = Thread(target=self._speak, daemon=True)
+        thread.start()
+        try:
+            following = self.counts[0] if self.counts else math.inf
+            for count, item in enumerate(self.iterable, 1):
+                yield item
+                if count >= following:
+                    following = self._reach(count)
+        finally:
+            self.queue.close()
+            thread.join()
@@ -1,8 +1,16 @@
 from typing import Callable, Any, Optional, List, Tuple
-from threading import Thread
+from threading import Thread, Lock
+from concurrent.futures import CancelledError
+from collections import deque
+from queue import Queue, Empty
+import http.client
+import math
+import socket
+import time
 import urllib.parse
 import urllib.request
 import json
+import weakref
 HEADER_JSON = {"Content-Type": "application/json"}
 
 def dict2post(data: dict) -> bytes:
@@ -12,6 +20,28 @@ def dict2get(data: dict) -> str:
     return urllib.parse.urlencode(data)
 
 
+class _TrackingHandler(urllib.request.HTTPHandler):
+    '''
+    HTTPHandler which tells connection to Talker,
+    so that the connection can be closed from other thread.
+    Talker is referred weakly, so that the opener, which refers
+    the handler and is referred by it, does not keep the result.
+    '''
+    def __init__(self, talker: 'Talker'):
+        super().__init__()
+        self.talker = weakref.ref(talker)
+
+    def http_open(self, req):
+        return self.do_open(self._connect, req)
+
+    def _connect(self, host, **kwargs) -> http.client.HTTPConnection:
+        connection = http.client.HTTPConnection(host, **kwargs)
+        talker = self.talker()
+        if talker is not None:
+            talker.connection = connection
+        return connection
+
+
 class Talker:
     '''
     Class to talk with server.
@@ -43,6 +73,11 @@ class Talker:
         self.post_data: Optional[bytes] = None
         self.header: dict = {}
         self.fix_method = False
+        self.cancelled = False
+        self.connection: Optional[http.client.HTTPConnection] = None
+        self.error: Optional[BaseException] = None
+        self.timeout: Optional[float] = None
+        self.callback: Optional[Callable[[bytes], Any]] = None
 
     def set_post(self, data: bytes) -> 'Talker':
         '''
@@ -85,6 +120,22 @@ class Talker:
         self.header = data
         return self
 
+    def set_timeout(self, timeout: Optional[float]) -> 'Talker':
+        '''
+        Set seconds to wait for connection and each read.
+        If None, default timeout of socket is used.
+        '''
+        self.timeout = timeout
+        return self
+
+    def set_callback(self, callback: Callable[[bytes], Any]) -> 'Talker':
+        '''
+        Set function called with response in the thread made by send,
+        after the request succeeded. get waits for it.
+        '''
+        self.callback = callback
+        return self
+
     def set_method(self, method: str) -> 'Talker':
         '''
         Set method like GET or POST.
@@ -118,11 +169,47 @@ class Talker:
         '''
         Get something from server.
         '''
-        with urllib.request.urlopen(self.request) as f:
-            data = f.read()
+        if self.cancelled:
+            raise CancelledError()
+        opener = urllib.request.build_opener(_TrackingHandler(self))
+        try:
+            timeout = socket.getdefaulttimeout() if self.timeout is None\
+                else self.timeout
+            with opener.open(self.request, timeout=timeout) as f:
+                data = f.read()
+        except OSError:
+            if self.cancelled:
+                raise CancelledError()
+            raise
+        finally:
+            opener.close()
+        if self.cancelled:
+            raise CancelledError()
         self.result = data
         return data
 
+    def _run(self) -> None:
+        try:
+            data = self._get()
+            if self.callback is not None:
+                self.callback(data)
+        except BaseException as er:
+            self.error = er
+
+    def cancel(self) -> None:
+        '''
+        Abort the request.
+        Socket is shut down and so the server can know that
+        nobody waits the response.
+        '''
+        self.cancelled = True
+        connection = self.connection
+        if connection is not None and connection.sock is not None:
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
     def send(self) -> 'Talker':
         '''
         Send something to url and api and makes thread to wait for them.
@@ -131,7 +218,7 @@ class Talker:
         '''
         self._make_request()
         self.running = True
-        self.runner = Thread(target=self._get)
+        self.runner = Thread(target=self._run)
         self.runner.start()
         return self
 
@@ -142,6 +229,105 @@ class Talker:
         if self.running:
             self.running = False
             self.runner.join()
+            if self.error is not None:
+                raise self.error
             return self.result
         self._make_request()
         return self._get()
+
+
+class LatencyWindow:
+    '''
+    Latency of recent requests, to know when a request is late.
+    It is shared by copies of Speaker.
+
+    size: int
+        Number of latencies kept.
+    minimum: int
+        Number of latencies needed to tell percentile.
+    '''
+    def __init__(self, size: int = 100, minimum: int = 10):
+        self.latencies: deque = deque(maxlen=size)
+        self.minimum = minimum
+        self.lock = Lock()
+
+    def __deepcopy__(self, memo: dict) -> 'LatencyWindow':
+        return self
+
+    def add(self, seconds: float) -> None:
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        '''
+        Latency which q of requests finished in, like 0.9.
+        None if there are not enough latencies yet.
+        '''
+        with self.lock:
+            if len(self.latencies) < self.minimum:
+                return None
+            latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1,
+                             int(q * len(latencies)))]
+
+
+def hedge(talkers: List[Talker], delay: float,
+          timeout: Optional[float] = None) -> Tuple[int, bytes]:
+    '''
+    Send the first request, and send the next one if no response is
+    got in delay seconds or the former one failed.
+    The first response is used and the other requests are cancelled.
+
+    talkers: List[Talker]
+        Requests to send in order, like the same request to
+        other servers.
+    delay: float
+        Seconds to wait before sending the next request.
+    timeout: Optional[float]
+        Seconds to wait for all the requests.
+
+    Returns
+    ----------
+    Tuple[int, bytes]: Index of talker which answered and its response.
+    '''
+    finished: Queue = Queue()
+    end = math.inf if timeout is None else time.monotonic() + timeout
+    next_time = 0.0
+    started = 0
+    running = 0
+    error: Optional[BaseException] = None
+
+    def run(index: int) -> None:
+        try:
+            finished.put((index, talkers[index].get(), None))
+        except BaseException as er:
+            finished.put((index, None, er))
+    try:
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                raise TimeoutError('No response in time.')
+            if started < len(talkers) and (running == 0 or now >= next_time):
+                Thread(target=run, args=(started,), daemon=True).start()
+                started += 1
+                running += 1
+                next_time = now + delay
+            wait = end - now
+            if started < len(talkers):
+                wait = min(wait, max(0.0, next_time - now))
+            try:
+                index, data, er = finished.get(
+                    timeout=None if wait == math.inf else wait)
+            except Empty:
+                continue
+            running -= 1
+            if er is None:
+                return index, data
+            if isinstance(er, CancelledError):
+                raise er
+            error = er
+            if running == 0 and started == len(talkers):
+                raise error
+    finally:
+        for talker in talkers:
+            talker.cancel()
@@ -0,0 +1,149 @@
+'''
+Phrases with fixed parts and variable slots.
+Fixed parts are got from voicevox only once, and variable parts like
+numbers are got one by one or prepared in advance. They are joined
+as PCM, so a progress message is made without asking voicevox.
+
+>>> from ninvoicevox import Speaker, AsyncQueue, Template
+>>> speaker = Speaker(enable_cache=True)
+>>> progress = Template(speaker, '処理が{}%終わりました。')  # doctest: +SKIP
+>>> _ = progress.prepare(range(0, 101, 10))  # doctest: +SKIP
+>>> with AsyncQueue() as q:  # doctest: +SKIP
+...     q.put(progress(30).speak)
+'''
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from logging import Logger
+from string import Formatter
+from threading import Lock
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Tuple
+from .player import Player, UNIX_SOUND_PLAYER, get_player
+from .voice import Speaker, Voice, logger
+from .wav import WavInfo, make_wav, parse_wav, silence
+
+
+class SplicedVoice:
+    '''
+    Voice made by joining PCM.
+    It has the same methods as Voice to use it.
+    '''
+
+    def __init__(self, sound: bytes, speaker: Speaker):
+        self.sound = sound
+        self.speaker = speaker
+
+    def get(self, timeout: float = 5.0) -> bytes:
+        return self.sound
+
+    def speak(self, command: List[str] | None | Player = UNIX_SOUND_PLAYER
+              ) -> None:
+        get_player(command, self.speaker.metrics).play(self.sound)
+
+    def render(self, output: Optional[BinaryIO] = None) -> Optional[bytes]:
+        if output is None:
+            return self.sound
+        output.write(self.sound)
+        output.flush()
+        return None
+
+
+class Template:
+    '''
+    Phrase template like '処理が{}%終わりました。'.
+    Fields are written like str.format.
+
+    speaker: Speaker
+        Speaker to read. Phoneme length is used only at the start and
+        the end of whole phrase.
+    template: str
+        Template of phrase.
+    workers: int
+        Number of requests sent at once by prepare.
+    '''
+
+    def __init__(self, speaker: Speaker, template: str, workers: int = 4,
+                 logger: Logger = logger):
+        self.logger = logger
+        self.template = template
+        self.workers = workers
+        self.outer_speaker = speaker
+        self.speaker = copy(speaker)
+        self.speaker.pre_phoneme_length = 0.0
+        self.speaker.post_phoneme_length = 0.0
+        self.speaker.parallel = False
+        self.speaker.preload = True
+        self.parts: List[Tuple[Optional[Voice], Optional[tuple]]] = [
+            (Voice(literal, self.speaker, logger) if literal else None,
+             None if name is None else (name, spec))
+            for literal, name, spec, _ in Formatter().parse(template)]
+        self.bank: Dict[str, memoryview] = {}
+        self.info: Optional[WavInfo] = None
+        self.lock = Lock()
+
+    def _pcm(self, sound: bytes) -> memoryview:
+        info = parse_wav(sound)
+        if self.info is None:
+            self.info = info
+        elif info[:3] != self.info[:3]:
+            raise ValueError('Format of voices are different.')
+        return memoryview(sound)[info.offset:info.offset + info.length]
+
+    def _slot(self, text: str) -> memoryview:
+        pcm = self.bank.get(text)
+        if pcm is not None:
+            self.speaker.metrics.observe('template_slot_seconds', 0.0,
+                                         cache='hit')
+            return pcm
+        speaker = copy(self.speaker)
+        speaker.preload = False
+        with self.speaker.metrics.timer('template_slot_seconds',
+                                        cache='miss'):
+            sound = Voice(text, speaker, self.logger).get()
+        with self.lock:
+            return self.bank.setdefault(text, self._pcm(sound))
+
+    def prepare(self, values: Iterable[Any], spec: str = '') -> 'Template':
+        '''
+        Get voices of values in advance, like numbers of progress.
+
+        values: Iterable[Any]
+            Values which will be put into fields.
+        spec: str
+            Format spec of the field like '.1f'.
+        '''
+        texts = {format(value, spec) for value in values}
+        with ThreadPoolExecutor(self.workers) as pool:
+            list(pool.map(self._slot, texts - set(self.bank)))
+        return self
+
+    def __call__(self, *args: Any, **kwargs: Any) -> SplicedVoice:
+        '''
+        Make voice by values of fields.
+        '''
+        chunks: List[memoryview] = []
+        index = 0
+        for voice, field in self.parts:
+            if voice is not None:
+                sound = voice.get()
+                with self.lock:
+                    chunks.append(self._pcm(sound))
+            if field is None:
+                continue
+            name, spec = field
+            if name == '':
+                value = args[index]
+                index += 1
+            else:
+                value = Formatter().get_field(name, args, kwargs)[0]
+            text = format(value, spec)
+            if text:
+                chunks.append(self._slot(text))
+        info = self.info
+        pre = silence(self.outer_speaker.pre_phoneme_length,
+                      info.rate, info.channels, info.width)
+        post = silence(self.outer_speaker.post_phoneme_length,
+                       info.rate, info.channels, info.width)
+        return SplicedVoice(
+            make_wav(b''.join([pre] + chunks + [post]),
+                     info.rate, info.channels, info.width),
+            self.outer_speaker)
@@ -1,3 +1,18 @@
+'''
+Text normalization before sending text to voicevox.
+Rules are compiled into one regular expression and
+replaced in single pass.
+
+>>> normalizer = Normalizer(ZUNDA_RULES + READING_RULES)
+>>> normalizer('2024-01-05はテストです。')
+'2024年1月5日はテストなのだ。'
+'''
+import re
+from collections import namedtuple
+from typing import Any, Callable, Iterable, Iterator, List, Union
+
+Rule = namedtuple('Rule', ('pattern', 'replacement'))
+
 ZUNDA_FOOTER = (
     ('なのです。', 'なのだ。'),
     ('ませんでした。', 'なかったのだ。'),
@@ -6,9 +21,132 @@ ZUNDA_FOOTER = (
     ('いです。', 'のだ。'),
     ('です。', 'なのだ。')
 )
+DIGITS = 'ゼロ イチ ニ サン ヨン ゴ ロク ナナ ハチ キュウ'.split()
+
+
+def literal_rules(pairs: Iterable[tuple]) -> List[Rule]:
+    '''
+    Make rules which replace fixed strings.
+    '''
+    return [Rule(re.escape(old), new) for old, new in pairs]
+
+
+def _read_date(match: Any) -> str:
+    year, month, day = match.group(1, 2, 3)
+    return f'{year}年{int(month)}月{int(day)}日'
+
+
+def _read_time(match: Any) -> str:
+    hour, minute, second = match.group(1, 2, 3)
+    text = f'{int(hour)}時{int(minute)}分'
+    return text + f'{int(second)}秒' if second else text
+
+
+def _read_digits(match: Any) -> str:
+    return ' '.join(DIGITS[int(d)] for d in match.group())
+
+
+ZUNDA_RULES = literal_rules(ZUNDA_FOOTER)
+READING_RULES = [
+    # URL is not readable and long.
+    Rule(r'https?://[^\s]+', 'ユーアールエル'),
+    # Hash and UUID are noise of logs.
+    Rule(r'(?<![0-9A-Za-z])(?=[0-9a-f-]*[a-f])(?=[0-9a-f-]*\d)'
+         r'[0-9a-f]{8,}(?:-[0-9a-f]{4,})*(?![0-9A-Za-z])', ''),
+    Rule(r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})', _read_date),
+    Rule(r'(?<!\d)(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?(?!\d)',
+         _read_time),
+    # Separator of thousands.
+    Rule(r'(?<=\d),(?=\d{3})', ''),
+    # Number longer than 兆 is read digit by digit.
+    Rule(r'\d{13,}', _read_digits),
+    Rule(r'[-=_*#~+<>|\\^]{2,}', ' '),
+]
+
+
+class Normalizer:
+    '''
+    Replace text by rules in single pass.
+    All the patterns are joined into one regular expression and
+    the rule which matched first is used at each position.
+    So, if a pattern is a part of other pattern, longer one should
+    be written earlier.
+
+    rules: Iterable[Rule]
+        Pairs of regular expression and replacement.
+        Replacement is str or function which gets match object.
+        Group numbers of the match object are the same as the pattern.
+    '''
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self.rules: List[Rule] = []
+        for rule in rules:
+            self.add(*rule)
+
+    def add(self, pattern: str,
+            replacement: Union[str, Callable[[Any], str]]
+            ) -> 'Normalizer':
+        '''
+        Add a rule. It is compiled again.
+        '''
+        self.rules.append(Rule(pattern, replacement))
+        self._compile()
+        return self
+
+    def _compile(self) -> None:
+        self.groups = {}
+        patterns = []
+        index = 1
+        for rule in self.rules:
+            self.groups[index] = rule.replacement
+            patterns.append(f'({rule.pattern})')
+            index += re.compile(rule.pattern).groups + 1
+        self.regex = re.compile('|'.join(patterns))
+
+    def _replace(self, match: re.Match) -> str:
+        replacement = self.groups[match.lastindex]
+        if isinstance(replacement, str):
+            return replacement
+        return replacement(_SubMatch(match, match.lastindex))
+
+    def __call__(self, text: str) -> str:
+        if not self.rules:
+            return text
+        return self.regex.sub(self._replace, text)
+
+    def stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        '''
+        Normalize text line by line.
+        Chunks are joined until newline, so that a match is not
+        broken by border of chunks.
+        '''
+        rest = ''
+        for chunk in chunks:
+            lines = (rest + chunk).split('\n')
+            rest = lines.pop()
+            for line in lines:
+                yield self(line) + '\n'
+        if rest:
+            yield self(rest)
+
+
+class _SubMatch:
+    '''
+    Match object of a rule in joined regular expression.
+    Groups are numbered as if the rule was matched alone.
+    '''
+    def __init__(self, match: re.Match, index: int):
+        self.match = match
+        self.index = index
+
+    def group(self, *indexes: int):
+        indexes = indexes or (0,)
+        result = tuple(self.match.group(self.index + i) for i in indexes)
+        return result[0] if len(result) == 1 else result
+
+
+zundamon = Normalizer(ZUNDA_RULES)
 
 
 def change_style(text):
-    for zf in ZUNDA_FOOTER:
-        text = text.replace(*zf)
-    return text
+    return zundamon(text)
@@ -19,21 +19,35 @@ A python client of voicevox-engine.
 >>>     q.put(voice['end'].speak)  # Speaks in backgournd after 'under_going'.
 '''
 import json
+import csv
 import time
 from pathlib import Path
-from typing import List, Optional
-from threading import Thread
-from subprocess import PIPE, Popen
-from collections import namedtuple
-from .talker import Talker, dict2post, dict2get
+from typing import (List, Optional, Tuple, Dict, Callable, BinaryIO,
+                    Iterable, Iterator, Deque, TYPE_CHECKING)
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor,
+                                CancelledError, Future, FIRST_COMPLETED,
+                                wait)
+from threading import Thread, Event, Lock, get_ident
+from urllib.error import URLError, HTTPError
+import weakref
+from collections import namedtuple, deque
+from .talker import Talker, dict2post, dict2get, LatencyWindow, hedge
 from hashlib import md5
 import os
 from logging import getLogger, basicConfig, WARNING, Logger, NullHandler
 import tempfile
-from itertools import chain
-from copy import deepcopy
+from itertools import chain, islice
+from copy import copy, deepcopy
 from .asyncqueue import AsyncQueue
-import sys
+from .cache import (DictionaryIndex, CacheFormat, normalize_surface,
+                    convert, encode, decode, is_raw_wav, usage_log)
+from .metrics import Metrics, metrics
+from .player import Player, get_player, UNIX_SOUND_PLAYER
+from .wav import (WavInfo, parse_wav, join_wav, make_header, silence,
+                  STREAMING_LENGTH)
+if TYPE_CHECKING:
+    from .dialogue import Dialogue
+    from .progress import Progress
 
 basicConfig(level=WARNING)
 logger = getLogger('ninvoice')
@@ -41,37 +55,133 @@ logger.addHandler(NullHandler())
 HEADER_JSON = {"Content-Type": "application/json"}
 VOICE_TOKEN_API = 'audio_query'
 VOICE_API = 'synthesis'
-UNIX_SOUND_PLAYER = ['aplay']
+CANCELLABLE_VOICE_API = 'cancellable_synthesis'
 DEFAULT_URL: str = 'http://localhost:50021'
-if os.name == 'nt':
-    import winsound
 
 
+_user_dict_lock = Lock()
+# Number of changes of user dictionary by Dictionary for each url.
+# Speaker gets user dictionary again when it is changed.
+_dictionary_versions: Dict[str, int] = {}
 NameStyle = namedtuple('NameStyle', ('name', 'style'))
 SpeakerInfo = namedtuple('SpeakerInfo', ('name', 'id'))
 
 
+Word = namedtuple('Word', ('surface', 'pronunciation', 'accent_type',
+                           'word_type', 'priority'),
+                  defaults=(None, None))
+# Fields of user_dict which voicevox sets by word_type.
+PART_OF_SPEECH = ('part_of_speech', 'part_of_speech_detail_1',
+                  'part_of_speech_detail_2', 'part_of_speech_detail_3')
+WORD_TYPES = {
+    'PROPER_NOUN': ('名詞', '固有名詞', '一般', '*'),
+    'COMMON_NOUN': ('名詞', '一般', '*', '*'),
+    'VERB': ('動詞', '自立', '*', '*'),
+    'ADJECTIVE': ('形容詞', '自立', '*', '*'),
+    'SUFFIX': ('名詞', '接尾', '一般', '*'),
+}
+
+
+def check_word(word: Word, place: str = '') -> Word:
+    '''
+    Raise ValueError if word_type of word is not known by voicevox.
+
+    place: str
+        Where the word is written, like 'words.csv line 3'.
+    '''
+    if word.word_type is not None and word.word_type not in WORD_TYPES:
+        raise ValueError(
+            f'Unknown word_type {word.word_type!r} of {word.surface!r}'
+            + (f' at {place}' if place else '')
+            + f'. It must be one of {", ".join(WORD_TYPES)}.')
+    return word
+
+
+def load_words(path: str) -> List[Word]:
+    '''
+    Load word list for Dictionary.sync.
+    If name of the file ends with '.json', it should be a list of dict
+    which has keys of Word. Otherwise it is read as csv like below.
+    ValueError is raised for unknown word_type.
+
+    surface,pronunciation,accent_type[,word_type[,priority]]
+    '''
+    with open(path, encoding='utf-8', newline='') as fp:
+        if str(path).endswith('.json'):
+            return [check_word(Word(**word), f'{path} item {num}')
+                    for num, word in enumerate(json.load(fp), 1)]
+        words = []
+        reader = csv.reader(fp)
+        for row in reader:
+            if not row or row[0].startswith('#'):
+                continue
+            row += [''] * (5 - len(row))
+            words.append(check_word(
+                Word(row[0], row[1], int(row[2]), row[3] or None,
+                     int(row[4]) if row[4] else None),
+                f'{path} line {reader.line_num}'))
+        return words
+
+
 class Dictionary:
     '''
     Class to configure dictionary of voicevox.
+
+    url: str
+        URL of voicevox.
+    logger: Logger
+        Logger you want to use.
+    cache_directories: List[str]
+        Directories of voice cache.
+        If a word is changed, cached voices which contain the word
+        are removed from these directories.
     '''
 
-    def __init__(self, url: str = DEFAULT_URL):
+    def __init__(self, url: str = DEFAULT_URL, logger: Logger = logger,
+                 cache_directories: List[str] = []):
         self.url = url
+        self.logger = logger
+        self.cache_directories = [Path(d) for d in cache_directories]
 
-    def get(self):
-        return json.loads(Talker(self.url, 'user_dict').get())
+    def invalidate(self, surfaces: List[str]) -> int:
+        '''
+        Remove cached voices which contain surfaces.
+        '''
+        return sum(DictionaryIndex(directory).invalidate(surfaces)
+                   for directory in self.cache_directories)
 
-    def delete(self, word_id: str):
+    def _changed(self, surfaces: List[str], url: str) -> None:
+        '''
+        Tell Speakers that user dictionary of url is changed and
+        remove cached voices. It is called after the server answered,
+        so that voices made before the change are not cached again.
+        '''
+        with _user_dict_lock:
+            key = url.rstrip('/')
+            _dictionary_versions[key] = _dictionary_versions.get(key, 0) + 1
+        self.invalidate(surfaces)
+
+    def _surface_of(self, word_id: str, url: str | None = None) -> List[str]:
+        if not self.cache_directories:
+            return []
+        word = self.get(url).get(word_id)
+        return [word['surface']] if word else []
+
+    def get(self, url: str | None = None):
+        return json.loads(Talker(url or self.url, 'user_dict').get())
+
+    def delete(self, word_id: str, url: str | None = None):
         '''
         word_id: str
         '''
-        return Talker(self.url, '/'.join(('user_dict_word', word_id)))\
-            .set_method('DELETE').send()
+        url = url or self.url
+        surfaces = self._surface_of(word_id, url)
+        return self._delete_talker(word_id, url)\
+            .set_callback(lambda _: self._changed(surfaces, url)).send()
 
     def update(
         self, word_id, surface: str, pronunciation: str, accent_type: int,
-        url: str = DEFAULT_URL,
+        url: str | None = None,
         word_type: str | None = None, priority: int | None = None
     ):
         '''
@@ -85,25 +195,18 @@ class Dictionary:
             Type of word. it is one of them.
             "PROPER_NOUN" "COMMON_NOUN" "VERB" "ADJECTIVE" "SUFFIX"
         '''
-        request = {
-                    'word_uuid': word_id,
-                    'surface': surface,
-                    'pronunciation': pronunciation,
-                    'accent_type': accent_type
-                 }
-        if word_type:
-            request.update({'word_type': word_type})
-        if priority:
-            request.update({'priority': priority})
-        return Talker(url, 'user_dict_word')\
-            .set_header(HEADER_JSON)\
-            .set_get(dict2get(request)).set_method('POST').send()
+        url = url or self.url
+        surfaces = self._surface_of(word_id, url) + [surface]
+        return self._update_talker(
+            word_id, Word(surface, pronunciation, accent_type,
+                          word_type, priority), url)\
+            .set_callback(lambda _: self._changed(surfaces, url)).send()
 
     def add(self, surface: str, pronunciation: str,
             accent_type: int,
-            url: str = DEFAULT_URL,
+            url: str | None = None,
             word_type: str | None = None,
-            priority: str | None = None):
+            priority: int | None = None):
         '''
         surface: str
             Surface of word.
@@ -115,18 +218,138 @@ class Dictionary:
             Type of word. it is one of them.
             "PROPER_NOUN" "COMMON_NOUN" "VERB" "ADJECTIVE" "SUFFIX"
         '''
+        url = url or self.url
+        word_id = self._add_talker(
+            Word(surface, pronunciation, accent_type, word_type, priority),
+            url).get()
+        self._changed([surface], url)
+        return word_id
+
+    @staticmethod
+    def _make_request(word: Word) -> dict:
         request = {
-                    'surface': surface,
-                    'pronunciation': pronunciation,
-                    'accent_type': accent_type
+                    'surface': word.surface,
+                    'pronunciation': word.pronunciation,
+                    'accent_type': word.accent_type
                  }
-        if word_type:
-            request.update({'word_type': word_type})
-        if priority:
-            request.update({'priority': priority})
+        if word.word_type:
+            request.update({'word_type': word.word_type})
+        if word.priority:
+            request.update({'priority': word.priority})
+        return request
+
+    def _add_talker(self, word: Word, url: str) -> Talker:
         return Talker(url, 'user_dict_word')\
             .set_header(HEADER_JSON)\
-            .set_get(dict2get(request)).set_method('POST').get()
+            .set_get(dict2get(self._make_request(word))).set_method('POST')
+
+    def _update_talker(self, word_id: str, word: Word, url: str) -> Talker:
+        return Talker(url, '/'.join(('user_dict_word', word_id)))\
+            .set_header(HEADER_JSON)\
+            .set_get(dict2get(self._make_request(word))).set_method('PUT')
+
+    def _delete_talker(self, word_id: str, url: str) -> Talker:
+        return Talker(url, '/'.join(('user_dict_word', word_id)))\
+            .set_method('DELETE')
+
+    def diff(self, words: List[Word], current: dict,
+             prune: bool = True) -> Tuple[List[Word],
+                                          List[Tuple[str, Word]],
+                                          List[str]]:
+        '''
+        Compare word list with user_dict of server.
+        Surface is compared after NFKC normalization, since
+        voicevox converts surface into full width characters.
+        word_type is compared with part of speech of the server.
+
+        words: List[Word]
+            Word list which should be in dictionary.
+        current: dict
+            Result of Dictionary.get.
+        prune: bool
+            If True, words which are not in the list are deleted.
+
+        Returns
+        ----------
+        (words to add, (word_id, word) to update, word_ids to delete)
+        '''
+        by_surface = {normalize_surface(word['surface']): (word_id, word)
+                      for word_id, word in current.items()}
+        wanted = {normalize_surface(word.surface): word for word in words}
+        to_add, to_update = [], []
+        for surface, word in wanted.items():
+            if surface not in by_surface:
+                to_add.append(word)
+                continue
+            word_id, old = by_surface[surface]
+            if old['pronunciation'] != word.pronunciation\
+                    or old['accent_type'] != word.accent_type\
+                    or (word.priority is not None
+                        and old.get('priority') != word.priority)\
+                    or (word.word_type is not None
+                        and tuple(old.get(key) for key in PART_OF_SPEECH)
+                        != WORD_TYPES[word.word_type]):
+                to_update.append((word_id, word))
+        to_delete = [word_id for surface, (word_id, _) in by_surface.items()
+                     if prune and surface not in wanted]
+        return to_add, to_update, to_delete
+
+    def sync(self, words: List[Word] | str,
+             urls: List[str] | None = None,
+             prune: bool = True, workers: int = 8) -> Dict[str, dict]:
+        '''
+        Make user dictionary of servers same as word list.
+        user_dict is got only once per server and
+        only differences are sent concurrently.
+
+        words: List[Word] | str
+            Word list or path of word list file. See load_words.
+        urls: List[str] | None
+            URLs of servers. If None, url of this object is used.
+        prune: bool
+            Delete words which are not in the word list.
+        workers: int
+            Number of requests sent at once.
+
+        Returns
+        ----------
+        Dict[str, dict]: Number of added, updated and deleted words by url.
+        '''
+        if isinstance(words, (str, Path)):
+            words = load_words(words)
+        words = [check_word(Word(*word)) for word in words]
+        result = {}
+        with ThreadPoolExecutor(workers) as executor:
+            for url in urls or [self.url]:
+                current = self.get(url)
+                to_add, to_update, to_delete = self.diff(
+                    words, current, prune)
+                jobs = chain(
+                    ((self._add_talker(w, url), w.surface) for w in to_add),
+                    ((self._update_talker(word_id, w, url),
+                      current[word_id]['surface'])
+                     for word_id, w in to_update),
+                    ((self._delete_talker(word_id, url),
+                      current[word_id]['surface'])
+                     for word_id in to_delete))
+                tasks = [(executor.submit(talker.get), surface)
+                         for talker, surface in jobs]
+                try:
+                    for task, _ in tasks:
+                        task.result()
+                finally:
+                    # Words changed before a failure are invalidated too.
+                    wait([task for task, _ in tasks])
+                    changed = [surface for task, surface in tasks
+                               if not task.cancelled()
+                               and task.exception() is None]
+                    if changed:
+                        self._changed(changed, url)
+                result[url] = dict(added=len(to_add),
+                                   updated=len(to_update),
+                                   deleted=len(to_delete))
+                self.logger.info(f'Dictionary of {url} synced: {result[url]}')
+        return result
 
 
 def speakerinfo2dict(loaded: List[dict]) -> SpeakerInfo:
@@ -218,6 +441,50 @@ class Speaker:
     enable_cache: bool = False
         Make cache file or not.
         This object makes cache file, however it does not delete the file.
+    track_dictionary: bool = True
+        Words of user dictionary in the text are used as a part of
+        name of cache file. So, cache is not used after the words are
+        changed. User dictionary is got from server only once, and
+        again after Dictionary in this process changed it.
+    normalizer: Optional[Callable[[str], str]] = None
+        Function to convert text before sending to voicevox.
+        terms.Normalizer is useful. Normalizer.stream can be used
+        to feed long text to this object line by line.
+    metrics: Metrics
+        Recorder of time spent in each stage. See metrics module.
+    postprocess: Optional[Callable[[bytes], bytes]] = None
+        Function to convert WAV from voicevox before caching.
+        wav.Processor trims silence and normalizes loudness.
+        Its repr is used as a part of name of cache file.
+    cancellable: bool = False
+        Use cancellable_synthesis API, so that cancelled voice does not
+        keep server busy. The server must be started with
+        --enable_cancellable_synthesis. If not, synthesis is used.
+    warmup: bool = False
+        Load model of the voice on server in background when this object
+        is made, so that the first voice is not late.
+        Time of the first voice is recorded as first_receive_seconds.
+    cache_format: Optional[CacheFormat] = None
+        Format to save cache, like CacheFormat('lzma', mono=True).
+        Cache in any format can be loaded.
+    deadline: Optional[float] = None
+        Seconds to get a voice from the first request to the server.
+        Each request times out at the deadline and TimeoutError is
+        raised. If None, requests wait forever.
+    hedge_percentile: Optional[float] = None
+        If synthesis is not answered in this percentile of recent
+        latency, like 0.9, the same request is sent to next of
+        hedge_urls, or to url again. The first response is used and
+        the other is cancelled. If None, it is not done.
+    hedge_urls: List[str] = []
+        URLs of other servers for hedged requests.
+    prefetch: int = 0
+        If cache is enabled, texts given to text method are recorded
+        in the cache directory with this configuration. If prefetch is
+        positive, this number of texts which were spoken often and
+        recently are got in background when this object is made, from
+        cache or from server. text method returns them at once.
+        It is not used by parallel speaker.
 
     >>> from ninvoicevox import AsyncQueue, Speaker, get_speaker_info
     >>> info = get_speaker_info()
@@ -252,6 +519,17 @@ class Speaker:
                  kana: str = "",
                  directory: str = 'voice_cache',
                  enable_cache: bool = False,
+                 track_dictionary: bool = True,
+                 normalizer: Optional[Callable[[str], str]] = None,
+                 metrics: Metrics = metrics,
+                 postprocess: Optional[Callable[[bytes], bytes]] = None,
+                 cache_format: Optional[CacheFormat] = None,
+                 cancellable: bool = False,
+                 warmup: bool = False,
+                 deadline: Optional[float] = None,
+                 hedge_percentile: Optional[float] = None,
+                 hedge_urls: List[str] = [],
+                 prefetch: int = 0,
                  logger: Logger = logger
                  ) -> None:
         self.directory = Path(directory)
@@ -270,19 +548,341 @@ class Speaker:
         self.output_stereo = output_stereo
         self.kana = kana
         self.enable_cache = enable_cache
+        self.track_dictionary = track_dictionary
+        self.normalizer = normalizer
+        self.metrics = metrics
+        self.postprocess = postprocess
+        self.cache_format = cache_format
+        self.cancellable = cancellable
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.hedge_urls = hedge_urls
+        self.latency = LatencyWindow()
+        self.first_voice = True
+        self.warmup_thread: Optional[Thread] = None
         self.logger = logger
+        self._user_dict: Optional[Dict[str, tuple]] = None
+        self._user_dict_version = 0
+        self.prefetch = prefetch
+        self.prefetched: Dict[str, Voice] = {}
+        self.prefetch_thread: Optional[Thread] = None
+        # Threads are started after all attributes are set.
+        if warmup:
+            self.warmup_thread = Thread(target=self.warmup, daemon=True)
+            self.warmup_thread.start()
+        if prefetch > 0 and enable_cache and not parallel:
+            self.prefetch_thread = Thread(target=self._prefetch, daemon=True)
+            self.prefetch_thread.start()
+
+    def warmup(self) -> bool:
+        '''
+        Initialize voice on server if it is not initialized.
+
+        Returns
+        ----------
+        bool: True if it was initialized by this method.
+        '''
+        try:
+            with self.metrics.timer('warmup_seconds') as labels:
+                query = dict2get(dict(speaker=self.speaker_id))
+                initialized = json.loads(
+                    Talker(self.url, 'is_initialized_speaker')
+                    .set_get(query).get())
+                labels['initialized'] = str(initialized).lower()
+                if not initialized:
+                    Talker(self.url, 'initialize_speaker')\
+                        .set_get(dict2get(dict(speaker=self.speaker_id,
+                                               skip_reinit='true')))\
+                        .set_method('POST').get()
+        except (URLError, OSError, ValueError) as er:
+            self.logger.info(f'Could not warm up: {er!r}')
+            return False
+        return not initialized
+
+    def __deepcopy__(self, memo: dict) -> 'Speaker':
+        # Threads and voices can not be copied and so they are shared.
+        speaker = copy(self)
+        memo[id(self)] = speaker
+        for key, value in self.__dict__.items():
+            if key not in ('warmup_thread', 'prefetch_thread',
+                           'prefetched'):
+                setattr(speaker, key, deepcopy(value, memo))
+        return speaker
+
+    def usage_key(self) -> str:
+        '''
+        Name of configuration which changes voice, to record usage.
+        URL is not included, since any server makes the same voice.
+        '''
+        config = dict(
+            speaker=self.speaker_id, speed=self.speed_scale,
+            pitch=self.pitch_scale, intonation=self.intonation_scale,
+            volume=self.volume_scale, pre=self.pre_phoneme_length,
+            post=self.post_phoneme_length, rate=self.output_sampling_rate,
+            stereo=self.output_stereo, kana=self.kana,
+            postprocess=repr(self.postprocess))
+        return md5(json.dumps(config).encode()).hexdigest()
+
+    def _prefetch(self) -> None:
+        '''
+        Get texts which are likely to be spoken.
+        Voices which are not got are not kept.
+        '''
+        speaker = copy(self)
+        speaker.preload = False
+        texts = usage_log(self.directory).top(self.usage_key(),
+                                              self.prefetch)
+        for text in texts:
+            voice = Voice(text if self.normalizer is None
+                          else self.normalizer(text), speaker, self.logger)
+            try:
+                voice.get()
+            except Exception as er:
+                self.logger.info(f'Could not prefetch "{text}": {er!r}')
+                continue
+            self.prefetched[text] = voice
+
+    def user_dict(self) -> Dict[str, tuple]:
+        '''
+        Get user dictionary of server as
+        {surface: (pronunciation, accent_type, priority)}.
+        It is got only once, and again after Dictionary changed it.
+        If server is not running, it is empty.
+        '''
+        with _user_dict_lock:
+            version = _dictionary_versions.get(self.url.rstrip('/'), 0)
+            if self._user_dict is None or self._user_dict_version != version:
+                self._user_dict_version = version
+                try:
+                    words = Dictionary(self.url, self.logger).get().values()
+                except (URLError, OSError):
+                    self.logger.info('Could not get user dictionary.')
+                    words = []
+                self._user_dict = {
+                    normalize_surface(w['surface']):
+                    (w['pronunciation'], w['accent_type'], w.get('priority'))
+                    for w in words}
+            return self._user_dict
+
+    def refresh_dictionary(self) -> None:
+        '''
+        Forget user dictionary got from server.
+        '''
+        with _user_dict_lock:
+            self._user_dict = None
+
+    def dictionary_words(self, text: str) -> List[tuple]:
+        '''
+        Words of user dictionary in the text.
+        '''
+        if not (self.enable_cache and self.track_dictionary):
+            return []
+        text = normalize_surface(text)
+        return sorted((surface, *word)
+                      for surface, word in self.user_dict().items()
+                      if surface in text)
 
     def text(self, text: str) -> 'Voice':
+        if self.enable_cache:
+            usage_log(self.directory).record(self.usage_key(), text)
+        if self.prefetch > 0 and not self.parallel:
+            voice = self.prefetched.get(text)
+            self.metrics.observe('prefetch_hits', float(voice is not None))
+            if voice is not None:
+                return voice
+        if self.normalizer is not None:
+            text = self.normalizer(text)
         if self.parallel:
             return Voices(text, self, self.logger)
         return Voice(text, self, self.logger)
 
+    def map(self, texts: Iterable[str], concurrency: int = 4,
+            ordered: bool = True, processes: int = 0
+            ) -> Iterator[Tuple[str, bytes]]:
+        '''
+        Get voices of many texts concurrently.
+        Results are yielded as soon as they are got, so memory is
+        bounded even for many texts.
+
+        texts: Iterable[str]
+            Texts to read. It is consumed lazily.
+        concurrency: int
+            Number of requests sent at once. At most twice of it
+            voices are kept in memory waiting to be yielded.
+        ordered: bool
+            If True, results are yielded in order of texts.
+            If False, they are yielded in order of completion.
+        processes: int
+            If it is positive and postprocess is set, postprocess
+            runs in a process pool of the size. postprocess must be
+            picklable like wav.Processor.
+
+        Returns
+        ----------
+        Iterator[Tuple[str, bytes]]: Pairs of text and WAV.
+
+        >>> for text, wav in speaker.map(texts, concurrency=8):
+        >>>     save(text, wav)
+        '''
+        speaker = copy(self)
+        speaker.preload = False
+        speaker.parallel = False
+        pool = ProcessPoolExecutor(processes)\
+            if processes > 0 and self.postprocess is not None else None
+        raw = copy(speaker)
+        raw.postprocess = None
+        raw.enable_cache = False
+
+        def receive(text: str) -> bytes:
+            voice = speaker.text(text)
+            if pool is None:
+                return voice.get()
+            if speaker.enable_cache and voice.load_cache():
+                return voice.sound
+            sound = Voice(voice.text, raw, self.logger).get()
+            with self.metrics.timer('postprocess_seconds'):
+                sound = pool.submit(speaker.postprocess, sound).result()
+            if speaker.enable_cache:
+                voice.sound = convert(sound, speaker.cache_format)
+                voice.save_cache()
+            else:
+                voice.sound = sound
+            return voice.sound
+
+        remaining = iter(texts)
+        window = concurrency * 2
+        with ThreadPoolExecutor(concurrency) as executor:
+            pending: Deque[Tuple[str, Future]] = deque()
+            try:
+                while True:
+                    for text in islice(remaining, window - len(pending)):
+                        pending.append((text,
+                                        executor.submit(receive, text)))
+                    if not pending:
+                        break
+                    if ordered:
+                        text, future = pending.popleft()
+                        yield text, future.result()
+                        continue
+                    wait([future for _, future in pending],
+                         return_when=FIRST_COMPLETED)
+                    for item in [item for item in pending
+                                 if item[1].done()]:
+                        pending.remove(item)
+                        yield item[0], item[1].result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+
+    def markup(self, text: str, urls: Optional[List[str]] = None,
+               sep: float = 0.4) -> 'Dialogue':
+        '''
+        Read text with inline markup of pauses and prosody like
+        'はじめます。[pause=800][speed=1.5]早口です。[/speed]'.
+        See markup module.
+
+        urls: Optional[List[str]]
+            URLs of servers. See Dialogue.
+        sep: float
+            Seconds of silence after punctuations.
+        '''
+        from .dialogue import Dialogue
+        from .markup import parse_markup
+        lines = parse_markup(text, self.speaker_id, sep)
+        if self.normalizer is not None:
+            lines = [line._replace(text=self.normalizer(line.text))
+                     for line in lines]
+        return Dialogue(lines, self, urls)
+
+    def progress(self, iterable: Iterable, every: float = 10,
+                 interval: float = 3.0, total: Optional[int] = None,
+                 message: str = '{}パーセント終わりました。',
+                 command: List[str] | None | Player = UNIX_SOUND_PLAYER
+                 ) -> 'Progress':
+        '''
+        Wrap iterable to speak percentage of progress.
+        See progress.Progress.
+
+        >>> for n in speaker.progress(range(1000), every=25):
+        >>>     heavy_task(n)
+        '''
+        from .progress import Progress
+        return Progress(iterable, self, every, interval, total, message,
+                        command, self.logger)
+
+
+class _Job:
+    '''
+    State of receiving voice, which is shared by Voice and its thread.
+    The thread does not refer to the Voice itself, and so the Voice can
+    be garbage collected while receiving and the request is cancelled.
+    '''
+
+    def __init__(self) -> None:
+        self.sound: Optional[bytes] = None
+        self.is_receiving = False
+        self.cancelled = False
+        self.done = Event()
+        self.talkers: List[Talker] = []
+        self.deadline: Optional[float] = None
+        # Cache file which is the same as sound.
+        self.cache_file: Optional[Path] = None
+
+    def remaining(self) -> Optional[float]:
+        '''
+        Seconds until the deadline.
+        '''
+        if self.deadline is None:
+            return None
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError('Deadline of voice is exceeded.')
+        return remaining
+
+    def talk(self, talker: Talker) -> bytes:
+        '''
+        Send request by talker, which can be cancelled by cancel method.
+        '''
+        return self.race([talker], 0.0)[1]
+
+    def race(self, talkers: List[Talker], delay: float) -> Tuple[int, bytes]:
+        '''
+        Send hedged requests. See talker.hedge.
+        '''
+        if self.cancelled:
+            raise CancelledError()
+        remaining = self.remaining()
+        for talker in talkers:
+            talker.set_timeout(remaining)
+        self.talkers = talkers
+        try:
+            if len(talkers) == 1:
+                return 0, talkers[0].get()
+            return hedge(talkers, delay, remaining)
+        finally:
+            self.talkers = []
+
+    def cancel(self) -> bool:
+        if self.sound is not None:
+            return False
+        self.cancelled = True
+        for talker in self.talkers:
+            talker.cancel()
+        self.done.set()
+        return True
+
 
 class Voice:
     '''
     Voice object.
     It can be yielded from text method of Speaker object.
     It can preload voice asynchronously before using it.
+    It can be used like concurrent.futures.Future, by done, cancel,
+    cancelled and result methods.
+    If it is garbage collected before the voice is received,
+    receiving is cancelled.
 
     text: str
         Text to read.
@@ -297,12 +897,53 @@ class Voice:
         self.logger = logger
         self.text = text
         self.speaker = speaker
-        self.is_receiving: bool = False
+        self._job = _Job()
+        weakref.finalize(self, self._job.cancel)
         if self.speaker.preload:
-            self.receive_thread = Thread(target=self._receive)
+            self._job.is_receiving = True
+            # Thread refers to a copy, which shares _job.
+            self.receive_thread = Thread(
+                target=copy(self)._receive_in_background, daemon=True)
             self.receive_thread.start()
-            self.is_receiving = True
-        self.sound: Optional[bytes] = None
+
+    @property
+    def sound(self) -> Optional[bytes]:
+        return self._job.sound
+
+    @sound.setter
+    def sound(self, sound: Optional[bytes]) -> None:
+        self._job.sound = sound
+
+    @property
+    def is_receiving(self) -> bool:
+        return self._job.is_receiving
+
+    def done(self) -> bool:
+        '''
+        True if voice is received or cancelled.
+        '''
+        return self.sound is not None or self._job.cancelled
+
+    def cancelled(self) -> bool:
+        return self._job.cancelled
+
+    def cancel(self) -> bool:
+        '''
+        Cancel receiving voice.
+        Request to the server is aborted. If Speaker.cancellable is True,
+        the server also stops synthesis.
+
+        Returns
+        ----------
+        bool: False if the voice was already received.
+        '''
+        return self._job.cancel()
+
+    def result(self, timeout: float = 5.0) -> bytes:
+        '''
+        Same as get.
+        '''
+        return self.get(timeout)
 
     def _setup_token_dict(self, online=True) -> dict:
         '''
@@ -312,12 +953,12 @@ class Voice:
             Get json from server. If False, makes own dictionary.
         '''
         if online:
-            voice_token = Talker(self.speaker.url, VOICE_TOKEN_API)\
-                .set_get(
+            voice_token = self._job.talk(
+                Talker(self.speaker.url, VOICE_TOKEN_API).set_get(
                     dict2get(
                         dict(text=self.text, speaker=self.speaker.speaker_id)
                     )
-                ).set_method('POST').get()
+                ).set_method('POST'))
             token_dict = json.loads(voice_token.decode('utf-8'))
         else:
             token_dict = dict(text=self.text, speaker=self.speaker.speaker_id)
@@ -335,61 +976,140 @@ class Voice:
             token_dict["kana"] = self.speaker.kana
         return token_dict
 
+    def _receive_in_background(self) -> None:
+        try:
+            self._receive()
+        except CancelledError:
+            pass
+        except Exception as er:
+            self.logger.warning(f'Failed to receive "{self.text}": {er!r}')
+
+    def _synthesis_talkers(self, api: str,
+                           voice_token: bytes) -> List[Talker]:
+        '''
+        Talkers of synthesis. If hedging is enabled and there are enough
+        latencies, talkers for hedged requests follow.
+        '''
+        urls = [self.speaker.url]
+        if self.speaker.hedge_percentile is not None:
+            urls += self.speaker.hedge_urls or [self.speaker.url]
+        return [Talker(url, api)
+                .set_header(HEADER_JSON)
+                .set_get(dict2get(dict(speaker=self.speaker.speaker_id)))
+                .set_post(voice_token) for url in urls]
+
+    def _hedged_synthesis(self, api: str, voice_token: bytes) -> bytes:
+        talkers = self._synthesis_talkers(api, voice_token)
+        delay = None
+        if len(talkers) > 1:
+            delay = self.speaker.latency.percentile(
+                self.speaker.hedge_percentile)
+        t = time.perf_counter()
+        if delay is None:
+            sound = self._job.talk(talkers[0])
+        else:
+            index, sound = self._job.race(talkers, delay)
+            self.speaker.metrics.observe('hedge_wins', float(index > 0))
+        self.speaker.latency.add(time.perf_counter() - t)
+        return sound
+
+    def _synthesis(self, voice_token: bytes) -> bytes:
+        '''
+        Get WAV from server.
+        If server does not support cancellable_synthesis, synthesis is used.
+        '''
+        if self.speaker.cancellable:
+            try:
+                return self._hedged_synthesis(CANCELLABLE_VOICE_API,
+                                              voice_token)
+            except HTTPError as er:
+                if er.code != 404:
+                    raise
+                self.logger.warning(f'{CANCELLABLE_VOICE_API} is disabled.')
+                self.speaker.cancellable = False
+        return self._hedged_synthesis(VOICE_API, voice_token)
+
     def _receive(self) -> None:
         '''
         Receive voice and put it in self.sound.
         It may be used as background task.
         '''
-        self.is_receiving = True
-        if self.logger is not None:
-            t = time.time()
-        if self.speaker.enable_cache:
-            if self.load_cache():
-                self.is_receiving = False
-                return None
-        self.token_dict = self._setup_token_dict()
-        voice_token = dict2post(self.token_dict)
-        self.sound = Talker(self.speaker.url, VOICE_API)\
-            .set_header(HEADER_JSON)\
-            .set_get(dict2get(dict(speaker=self.speaker.speaker_id)))\
-            .set_post(voice_token).get()
+        job = self._job
+        if job.cancelled:
+            raise CancelledError()
+        job.is_receiving = True
+        job.done.clear()
+        if job.deadline is None and self.speaker.deadline is not None:
+            job.deadline = time.monotonic() + self.speaker.deadline
+        try:
+            self._receive_once()
+        finally:
+            job.is_receiving = False
+            job.done.set()
+
+    def _receive_once(self) -> None:
+        metrics = self.speaker.metrics
+        t = time.perf_counter()
+        cache = 'disabled'
+        # Name is made once, so that the voice is not saved by user
+        # dictionary changed while it is synthesized.
+        name = self.make_fname() if self.speaker.enable_cache else None
         if self.speaker.enable_cache:
-            self.save_cache()
+            with metrics.timer('cache_lookup_seconds') as labels:
+                cache = 'hit' if self.load_cache(name) else 'miss'
+                labels['cache'] = cache
+        if cache != 'hit':
+            with metrics.timer('audio_query_seconds'):
+                self.token_dict = self._setup_token_dict()
+            voice_token = dict2post(self.token_dict)
+            with metrics.timer('synthesis_seconds'):
+                sound = self._synthesis(voice_token)
+            metrics.observe('received_bytes', len(sound))
+            if self.speaker.postprocess is not None:
+                with metrics.timer('postprocess_seconds'):
+                    sound = self.speaker.postprocess(sound)
+            if self.speaker.enable_cache:
+                sound = convert(sound, self.speaker.cache_format)
+            if self._job.cancelled:
+                raise CancelledError()
+            self.sound = sound
+            if self.speaker.enable_cache:
+                self.save_cache(name)
+        spent = time.perf_counter() - t
+        metrics.observe('receive_seconds', spent, cache=cache)
+        if self.speaker.first_voice:
+            self.speaker.first_voice = False
+            metrics.observe('first_receive_seconds', spent, cache=cache,
+                            warmup=str(self.speaker.warmup_thread
+                                       is not None).lower())
         if self.logger is not None:
-            self.logger.info(f'Time spent to speak: {time.time() - t}')
-        self.is_receiving = False
+            self.logger.info(f'Time spent to speak: {spent}')
 
     def get(self, timeout: float = 5.0) -> bytes:
         '''
         Get voice data from voicevox.
+        If it is receiving in other thread, it waits the thread.
+        Preloading thread is waited without timeout.
         If it failed to receive sound, it tries to receive again
         until timeout.
-        If preload option is True or is receiving,
-        it does not retry.
 
-        trial_num: int
-            Number to try.
+        timeout: float
+            Seconds to retry.
 
         Returns
         ----------
         bytes: Voice from voicevox.
         '''
-        if self.speaker.preload and self.is_receiving:
-            self.receive_thread.join()
-            while self.sound is None:
-                self.receive_thread = self._receive()
-        else:
-            # If sound could not be loaded, repeat receiving.
-            if self.is_receiving:
-                count = 0
-                while self.sound is None and count * 0.1 < timeout:
-                    time.sleep(0.1)
-                    count += 1
-            else:
-                t = time.time()
-                while self.sound is None and time.time() - t < timeout:
-                    self._receive()
+        job = self._job
+        if job.is_receiving:
+            job.done.wait(None if self.speaker.preload else timeout)
+        t = time.time()
+        while self.sound is None and not job.cancelled\
+                and time.time() - t < timeout:
+            self._receive()
         if self.sound is None:
+            if job.cancelled:
+                raise CancelledError()
             raise Exception('No sound is loaded')
         return self.sound
 
@@ -402,46 +1122,78 @@ class Voice:
         token_dict['url'] = self.speaker.url
         token_dict['text'] = self.text
         token_dict['speaker'] = self.speaker.speaker_id
+        words = self.speaker.dictionary_words(self.text)
+        if words:
+            token_dict['dictionary'] = words
+        if self.speaker.postprocess is not None:
+            token_dict['postprocess'] = repr(self.speaker.postprocess)
+        cache_format = self.speaker.cache_format
+        if cache_format is not None and (cache_format.mono
+                                         or cache_format.rate):
+            token_dict['cache_format'] = [cache_format.mono,
+                                          cache_format.rate]
         hash_md5 = md5()
         hash_md5.update(json.dumps(token_dict).encode())
         return hash_md5.hexdigest()
 
-    def save_cache(self) -> None:
+    def save_cache(self, name: Optional[str] = None) -> None:
         '''
-        Load voice cache from disk.
+        Save voice cache to disk.
 
-        logger: Logger
-            If you want to replace logger, you can set it.
+        name: Optional[str]
+            Name of cache file. If None, it is made by make_fname.
         '''
         if self.sound is None:
             raise Exception('Sound is None')
         if not os.path.exists(self.speaker.directory):
             os.makedirs(self.speaker.directory)
-        fname = self.speaker.directory / self.make_fname()
-        with open(fname, 'wb') as fb:
-            self.logger.info(f'cache saved as {fname}')
-            fb.write(self.sound)
+        name = name or self.make_fname()
+        fname = self.speaker.directory / name
+        data = encode(self.sound, self.speaker.cache_format)
+        # File is written with other name and renamed, so that broken
+        # file is never read.
+        temporary = fname.with_name(f'{name}.{os.getpid()}.{get_ident()}.tmp')
+        try:
+            with open(temporary, 'wb') as fb:
+                fb.write(data)
+            os.replace(temporary, fname)
+        except BaseException:
+            temporary.unlink(missing_ok=True)
+            raise
+        self.logger.info(f'cache saved as {fname}')
+        if data is self.sound:
+            self._job.cache_file = fname
+        words = self.speaker.dictionary_words(self.text)
+        DictionaryIndex(self.speaker.directory).add(
+            name, (word[0] for word in words))
 
-    def load_cache(self) -> bool:
+    def load_cache(self, name: Optional[str] = None) -> bool:
         '''
         Load voice cache from disk.
 
-        logger: Logger
-            If you want to replace logger, you can set it.
-        '''
-        fname = self.speaker.directory / self.make_fname()
-        if Path(fname).exists():
-            with open(fname, 'rb') as fb:
-                self.sound = fb.read()
-            if self.sound is None:
-                Exception('Cache is empty')
-            self.logger.info(f'loaded {fname}')
-            return True
-        else:
-            FileNotFoundError('There is no cache.')
+        name: Optional[str]
+            Name of cache file. If None, it is made by make_fname.
+        '''
+        fname = self.speaker.directory / (name or self.make_fname())
+        try:
+            data = fname.read_bytes()
+        except FileNotFoundError:
+            return False
+        try:
+            sound = decode(data)
+        except ValueError as er:
+            # Broken cache is removed and voice is got again.
+            self.logger.warning(f'Removed broken cache {fname}: {er!r}')
+            fname.unlink(missing_ok=True)
             return False
+        self.sound = sound
+        if sound is data:
+            self._job.cache_file = fname
+        self.logger.info(f'loaded {fname}')
+        return True
 
-    def speak(self, command: List[str] | None = UNIX_SOUND_PLAYER) -> None:
+    def speak(self, command: List[str] | None | Player = UNIX_SOUND_PLAYER
+              ) -> None:
         '''
         Play sound from voicevox.
 
@@ -457,22 +1209,61 @@ class Voice:
 
             If it is None, result will be written in stdout.
 
+            It can be a Player in player module.
+            PersistentPlayer plays voices without gap.
+
+            If the voice is cached without compression, the cache file
+            is sent to the program by os.sendfile without copy in
+            python. It is not loaded if it is not got yet.
+
         Returns
         -------
         None
         '''
-        if command is None:
-            sys.stdout.buffer.write(self.get())
-            return 0
-        if os.name == 'nt':
-            winsound.PlaySound(self.get(), winsound.SND_MEMORY)
-        else:
-            task = Popen(command, stdin=PIPE, stdout=PIPE, stderr=PIPE)
-            task.communicate(self.get())
-            task.wait()
+        player = get_player(command, self.speaker.metrics)
+        path = self._job.cache_file
+        cache_format = self.speaker.cache_format
+        if path is None and self.sound is None and not self.is_receiving\
+                and self.speaker.enable_cache\
+                and (cache_format is None or not cache_format.compression):
+            path = self.speaker.directory / self.make_fname()
+            if not is_raw_wav(path):
+                path = None
+        if path is not None:
+            try:
+                player.play_file(path)
+                self._job.cache_file = path
+                return None
+            except FileNotFoundError:
+                pass
+        player.play(self.get())
+
+    def render(self, output: Optional[BinaryIO] = None) -> Optional[bytes]:
+        '''
+        Get WAV or write it to output.
+        It is the same as Voices.render.
+        '''
+        if output is None:
+            return self.get()
+        output.write(self.get())
+        output.flush()
+        return None
 
 
 class Voices:
+    '''
+    Voice of long text.
+    The text is split by lines and punctuations and each of them is
+    got from voicevox in order.
+
+    text: str
+        Text to read.
+    speaker: Speaker
+        Speaker object, which represents attributes of voicevox.
+    logger: Logger
+        Logger you want to use.
+    '''
+
     def __init__(self, text: str, speaker: Speaker,
                  logger: Logger = logger) -> None:
         self.logger = logger
@@ -485,7 +1276,7 @@ class Voices:
         self.voices = [Voice(text, speaker_, logger)
                        for text in texts if text]
 
-    def speak(self, command: list | None = UNIX_SOUND_PLAYER,
+    def speak(self, command: list | None | Player = UNIX_SOUND_PLAYER,
               sep: float = 0.4):
         length = len(self.voices)
         with AsyncQueue() as aq:
@@ -495,3 +1286,126 @@ class Voices:
                 voice.speak(command)
                 if num < length - 1:
                     aq.put(time.sleep, sep)
+
+    def cancel(self) -> bool:
+        '''
+        Cancel voices which are not received yet.
+        '''
+        return any([voice.cancel() for voice in self.voices])
+
+    def fragments(self, start: int = 0, ahead: int = 4
+                  ) -> Iterator[Tuple[WavInfo, memoryview]]:
+        '''
+        Yield format and PCM of each voice in order.
+        Voices are got one by one in background while former ones are
+        used, and at most ahead voices are kept waiting to be used.
+
+        start: int
+            Index of the first voice.
+        ahead: int
+            Number of voices got before they are used.
+        '''
+        remaining = iter(self.voices[start:])
+        with ThreadPoolExecutor(1) as executor:
+            pending: Deque[Future] = deque()
+            try:
+                while True:
+                    for voice in islice(remaining, ahead - len(pending)):
+                        pending.append(executor.submit(voice.get))
+                    if not pending:
+                        break
+                    sound = pending.popleft().result()
+                    info = parse_wav(sound)
+                    yield info, memoryview(sound)[info.offset:
+                                                  info.offset + info.length]
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def render(self, output: Optional[BinaryIO] = None,
+               sep: float = 0.4) -> Optional[bytes]:
+        '''
+        Join voices into one WAV with silence between them.
+
+        output: Optional[BinaryIO]
+            If it is None, WAV is returned.
+            Otherwise, WAV is written to output as soon as each voice
+            is got. See wav.join_wav.
+        sep: float
+            Seconds of silence between voices.
+        '''
+        return join_wav(((info, pcm, sep if num else 0.0)
+                         for num, (info, pcm) in enumerate(self.fragments())),
+                        output)
+
+    @staticmethod
+    def _checkpoint_key(voice: Voice, sep: float) -> dict:
+        # Everything which changes PCM written by render_file.
+        speaker = voice.speaker
+        key = voice._setup_token_dict(False)
+        key['sep'] = sep
+        if speaker.postprocess is not None:
+            key['postprocess'] = repr(speaker.postprocess)
+        if speaker.cache_format is not None:
+            key['cache_format'] = [speaker.cache_format.mono,
+                                   speaker.cache_format.rate]
+        return key
+
+    def render_file(self, path: str, sep: float = 0.4) -> None:
+        '''
+        Write voices into WAV file one by one for long document.
+        Voices written to the file are recorded in a checkpoint file
+        next to it. If it is stopped by error, it is resumed from the
+        checkpoint and finished voices are not got again.
+        Length in header is fixed and the checkpoint is removed at
+        the end. Voices are released after they are written, so they
+        are got again if this object is rendered again.
+
+        path: str
+            WAV file to write.
+        sep: float
+            Seconds of silence between voices.
+        '''
+        path = Path(path)
+        checkpoint = path.with_name(path.name + '.checkpoint')
+        keys = [md5(json.dumps(self._checkpoint_key(voice, sep)).encode())
+                .hexdigest() for voice in self.voices]
+        state = dict(keys=[], offset=0, length=0, format=None)
+        if checkpoint.exists() and path.exists():
+            saved = json.loads(checkpoint.read_text())
+            if saved['keys'] == keys[:len(saved['keys'])]:
+                state = saved
+        done = len(state['keys'])
+        with open(path, 'r+b' if done else 'wb') as fp:
+            fp.seek(state['offset'] + state['length'])
+            fp.truncate()
+            for num, (info, pcm) in enumerate(self.fragments(done), done):
+                if state['format'] is None:
+                    fp.write(make_header(info.rate, info.channels,
+                                         STREAMING_LENGTH, info.width))
+                    state['format'] = list(info[:3])
+                    state['offset'] = fp.tell()
+                elif list(info[:3]) != state['format']:
+                    raise ValueError('Format of voices are different.')
+                if num:
+                    pad = silence(sep, info.rate, info.channels, info.width)
+                    fp.write(pad)
+                    state['length'] += len(pad)
+                fp.write(pcm)
+                state['length'] += len(pcm)
+                fp.flush()
+                os.fsync(fp.fileno())
+                # Written voice is not kept, so memory does not grow by
+                # length of the document.
+                pcm.release()
+                self.voices[num].sound = None
+                state['keys'] = keys[:num + 1]
+                temporary = checkpoint.with_name(checkpoint.name + '.tmp')
+                temporary.write_text(json.dumps(state))
+                os.replace(temporary, checkpoint)
+            if state['format'] is None:
+                raise ValueError('There is no voice.')
+            rate, channels, width = state['format']
+            fp.seek(0)
+            fp.write(make_header(rate, channels, state['length'], width))
+        checkpoint.unlink(missing_ok=True)
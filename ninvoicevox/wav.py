@@ -0,0 +1,252 @@
+'''
+Small tools for WAV of 16 bit PCM from voicevox.
+They do not use loop of python for each sample.
+Silence is found by regular expression on bytes and
+samples are scaled by map of builtin functions.
+
+>>> from ninvoicevox.wav import Processor
+>>> from ninvoicevox import Speaker
+>>> speaker = Speaker(postprocess=Processor(pad=0.05, loudness=-20))
+'''
+import math
+import operator
+import re
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+
+# Length of PCM written in header when the length is not known yet.
+STREAMING_LENGTH = 0xFFFFFFFF - 36
+WavInfo = namedtuple('WavInfo', ('rate', 'channels', 'width',
+                                 'offset', 'length'))
+
+
+def parse_wav(data: bytes, total: Optional[int] = None) -> WavInfo:
+    '''
+    Read header of WAV.
+    offset and length are position of PCM in data.
+
+    total: Optional[int]
+        Size of the whole WAV when data is only the head of it,
+        like the first bytes of a file.
+    '''
+    view = memoryview(data)
+    total = len(view) if total is None else total
+    if bytes(view[:4]) != b'RIFF' or bytes(view[8:12]) != b'WAVE':
+        raise ValueError('It is not WAV.')
+    position = 12
+    rate = channels = width = None
+    while position + 8 <= len(view):
+        chunk, size = struct.unpack_from('<4sI', view, position)
+        position += 8
+        if chunk == b'fmt ':
+            _, channels, rate, _, _, bits = struct.unpack_from(
+                '<HHIIHH', view, position)
+            width = bits // 8
+        elif chunk == b'data':
+            if rate is None:
+                raise ValueError('fmt chunk is not found.')
+            return WavInfo(rate, channels, width, position,
+                           min(size, total - position))
+        position += size + size % 2
+    raise ValueError('data chunk is not found.')
+
+
+def make_header(rate: int, channels: int, length: int,
+                width: int = 2) -> bytes:
+    '''
+    Make header of WAV whose PCM is length bytes.
+    '''
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+                       b'RIFF', 36 + length, b'WAVE',
+                       b'fmt ', 16, 1, channels, rate,
+                       rate * channels * width, channels * width,
+                       width * 8, b'data', length)
+
+
+def make_wav(pcm: bytes, rate: int, channels: int, width: int = 2) -> bytes:
+    return make_header(rate, channels, len(pcm), width) + pcm
+
+
+def silence(seconds: float, rate: int, channels: int,
+            width: int = 2) -> bytes:
+    '''
+    PCM of silence. Length is rounded to frame.
+    '''
+    return bytes(int(round(seconds * rate)) * channels * width)
+
+
+def join_wav(parts: Iterable[Tuple[WavInfo, memoryview, float]],
+             output: Optional[BinaryIO] = None) -> Optional[bytes]:
+    '''
+    Join PCM into one WAV.
+
+    parts: Iterable[Tuple[WavInfo, memoryview, float]]
+        Format, PCM and seconds of silence before the PCM.
+        Format of all the parts must be the same.
+    output: Optional[BinaryIO]
+        If it is None, WAV is returned.
+        Otherwise, WAV is written to output as soon as each part
+        is got. If output is seekable, length in header is fixed
+        at the end. If not, like stdout, header has the largest
+        length, which is usual for streaming WAV.
+    '''
+    info: Optional[WavInfo] = None
+    chunks: List[memoryview] = []
+    length = 0
+    start = None
+    for fragment, pcm, pause in parts:
+        if info is None:
+            info = fragment
+            if output is not None:
+                if output.seekable():
+                    start = output.tell()
+                output.write(make_header(info.rate, info.channels,
+                                         STREAMING_LENGTH, info.width))
+        elif fragment[:3] != info[:3]:
+            raise ValueError('Format of voices are different.')
+        pad = memoryview(silence(pause, info.rate, info.channels,
+                                 info.width))
+        for chunk in (pad, pcm):
+            length += len(chunk)
+            if output is None:
+                chunks.append(chunk)
+            else:
+                output.write(chunk)
+        if output is not None:
+            output.flush()
+    if info is None:
+        raise ValueError('There is no voice.')
+    header = make_header(info.rate, info.channels, length, info.width)
+    if output is None:
+        return b''.join([memoryview(header)] + chunks)
+    if start is not None:
+        end = output.tell()
+        output.seek(start)
+        output.write(header)
+        output.seek(end)
+        output.flush()
+    return None
+
+
+def _silence_regex(threshold: int, channels: int,
+                   reverse: bool = False) -> re.Pattern:
+    '''
+    Regular expression of frames whose samples are all quieter than
+    threshold. Threshold is rounded down to multiple of 256,
+    since only high byte of little endian sample is checked.
+    '''
+    high = max(1, threshold // 256)
+    quiet = (f'[\\x00-\\x{high - 1:02x}]'
+             f'|[\\x{256 - high:02x}-\\xff]')
+    sample = f'(?:(?:{quiet})[\\x00-\\xff])' if reverse\
+        else f'(?:[\\x00-\\xff](?:{quiet}))'
+    return re.compile(f'(?:{sample * channels})*'.encode(), re.DOTALL)
+
+
+def trim_silence(pcm: bytes, channels: int, threshold: int = 512) -> bytes:
+    '''
+    Remove silence at the start and the end of 16 bit PCM.
+    '''
+    head = _silence_regex(threshold, channels).match(pcm).end()
+    tail = _silence_regex(threshold, channels, True)\
+        .match(pcm[::-1]).end()
+    return pcm[head:max(head, len(pcm) - tail)]
+
+
+def _samples(pcm: bytes) -> array:
+    samples = array('h', pcm)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples
+
+
+def _tobytes(samples: array) -> bytes:
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def normalize_loudness(pcm: bytes, loudness: float = -20.0,
+                       peak: float = -1.0) -> bytes:
+    '''
+    Scale 16 bit PCM so that RMS becomes loudness in dBFS.
+    It is limited so that peak does not exceed peak in dBFS.
+    '''
+    samples = _samples(pcm)
+    if not samples:
+        return pcm
+    rms = math.sqrt(sum(map(operator.mul, samples, samples)) / len(samples))
+    top = max(max(samples), -min(samples))
+    if rms == 0:
+        return pcm
+    gain = min(32767 * 10 ** (loudness / 20) / rms,
+               32767 * 10 ** (peak / 20) / top)
+    return _tobytes(array('h', map(round, map(gain.__mul__, samples))))
+
+
+def to_mono(pcm: bytes, channels: int) -> bytes:
+    '''
+    Take the first channel of 16 bit PCM.
+    '''
+    if channels == 1:
+        return pcm
+    return array('h', pcm)[0::channels].tobytes()
+
+
+def resample(pcm: bytes, rate: int, new_rate: int) -> bytes:
+    '''
+    Change sampling rate of 16 bit mono PCM by nearest sample.
+    It is rough but enough for voice.
+    '''
+    if rate == new_rate:
+        return pcm
+    samples = array('h', pcm)
+    if rate % new_rate == 0:
+        return samples[::rate // new_rate].tobytes()
+    ratio = rate / new_rate
+    indexes = map(int, map(ratio.__mul__, range(int(len(samples) / ratio))))
+    return array('h', map(samples.__getitem__, indexes)).tobytes()
+
+
+class Processor:
+    '''
+    Post processing of WAV applied before caching.
+
+    trim: bool
+        Remove silence at the start and the end.
+    threshold: int
+        Amplitude regarded as silence. It is rounded to multiple of 256.
+    loudness: Optional[float]
+        Target RMS in dBFS. If None, volume is not changed.
+    pad: float
+        Seconds of silence put at the start and the end.
+    '''
+
+    def __init__(self, trim: bool = True, threshold: int = 512,
+                 loudness: Optional[float] = None, pad: float = 0.0):
+        self.trim = trim
+        self.threshold = threshold
+        self.loudness = loudness
+        self.pad = pad
+
+    def __repr__(self) -> str:
+        # It is a part of name of cache file.
+        return (f'Processor(trim={self.trim}, threshold={self.threshold}, '
+                f'loudness={self.loudness}, pad={self.pad})')
+
+    def __call__(self, data: bytes) -> bytes:
+        info = parse_wav(data)
+        if info.width != 2:
+            return data
+        pcm = data[info.offset:info.offset + info.length]
+        if self.trim:
+            pcm = trim_silence(pcm, info.channels, self.threshold)
+        if self.loudness is not None:
+            pcm = normalize_loudness(pcm, self.loudness)
+        if self.pad:
+            pad = silence(self.pad, info.rate, info.channels)
+            pcm = b''.join((pad, pcm, pad))
+        return make_wav(pcm, info.rate, info.channels)
@@ -2,8 +2,12 @@ from .voice import Speaker, get_speaker_info
 import traceback
 import sys
 import os
-from typing import Optional
+import time
+from typing import Optional, Dict, Tuple
 from urllib.error import URLError
+from threading import Thread, Event
+from queue import Queue
+from itertools import chain
 import atexit
 
 HOME = 'USERPROFILE' if os.name == 'nt' else 'HOME'
@@ -11,10 +15,17 @@ if 'ZUNDA_ERROR' in os.environ[HOME]:
     CACHE_DIRECTORY = os.environ["ZUNDA_ERROR"]
 else:
     CACHE_DIRECTORY = f'{os.environ[HOME]}/.zundaerror'
+# Seconds to wait voice of error. Python exits after it even if speaking.
+DEADLINE = float(os.environ.get('ZUNDA_ERROR_DEADLINE', 5.0))
+# Time of monotonic clock until which python waits voices after an
+# uncaught error. The end message uses only the rest of it.
+_exit_time: Optional[float] = None
 
 
-def zundamon_says(error_txt: str, backup_txt: Optional[str] = None, preload=True):
-    print(error_txt)
+def zundamon_says(error_txt: str, backup_txt: Optional[str] = None,
+                  preload=True, echo=True):
+    if echo:
+        print(error_txt)
     with_server = True
     try:
         info = get_speaker_info().name['ずんだもん']['ノーマル']
@@ -47,164 +58,156 @@ def make_single_cache(speaker: Speaker, text: str):
 def make_zundamon_cache():
     info = get_speaker_info().name['ずんだもん']['ノーマル']
     speaker = Speaker(info, enable_cache=True, directory=CACHE_DIRECTORY)
-    make_single_cache(speaker, 'そのようなファイルやフォルダはないのだ。')
-    make_single_cache(speaker, 'そのようなファイルやフォルダは既にあるのだ。')
-    make_single_cache(speaker, 'それはディレクトリなのだ。')
-    make_single_cache(speaker, 'それはディレクトリではないのだ。')
-    make_single_cache(speaker, '僕には十分なアクセス権がないのだ。')
-    make_single_cache(speaker, 'プロセスが見付からないのだ。')
-    make_single_cache(speaker, 'タイムアウトなのだ。')
-    make_single_cache(speaker, '中断するように言われたのだ。')
-    make_single_cache(speaker, '接続が拒否されたのだ。')
-    make_single_cache(speaker, '接続が中断されたのだ。')
-    make_single_cache(speaker, 'パイプが壊れたのだ。')
-    make_single_cache(speaker, '子プロセスが失敗したのだ。')
-    make_single_cache(speaker, '非同期処理に失敗したのだ。')
-    make_single_cache(speaker, 'ユニコードのエンコードに失敗したのだ。')
-    make_single_cache(speaker, 'ユニコードのデコードに失敗したのだ。')
-    make_single_cache(speaker, 'ローカル変数が変なのだ。')
-    make_single_cache(speaker, '型のエラーなのだ。')
-    make_single_cache(speaker, 'それは定義されていないのだ。')
-    make_single_cache(speaker, 'ゼロで割り算をしてはいけないのだ。')
-    make_single_cache(speaker, 'オーバーフローなのだ。')
-    make_single_cache(speaker, '数学的に間違いなのだ。')
-    make_single_cache(speaker, 'テストが失敗したようなのだ。')
-    make_single_cache(speaker, '属性のエラーなのだ。')
-    make_single_cache(speaker, '文字が入力されなかったのだ。')
-    make_single_cache(speaker, 'インポートできなかったのだ。')
-    make_single_cache(speaker, '添字が範囲外なのだ。')
-    make_single_cache(speaker, '辞書のキーが違うのだ。')
-    make_single_cache(speaker, 'ユーザーさんが中止しろって言ったからやめたのだ。')
-    make_single_cache(speaker, 'メモリー不足なのだ。')
-    make_single_cache(speaker, 'バッファ関連のエラーなのだ。')
-    make_single_cache(speaker, 'キーが違うのだ。')
-    make_single_cache(speaker, 'OS関連のエラーなのだ。')
-    make_single_cache(speaker, '無限ループしていそうなのだ。')
-    make_single_cache(speaker, '既にガベコレされているのだ。')
-    make_single_cache(speaker, '何かよくわからないエラーなのだ。')
-    make_single_cache(speaker, 'インデントがおかしいのだ。')
-    make_single_cache(speaker, 'タブとスペースどっちかにすべきなのだ。')
-    make_single_cache(speaker, 'インタプリタのエラーなのだ。')
-    make_single_cache(speaker, '文法が間違っているのだ。')
-    make_single_cache(speaker, '何らかのエラーなのだ。')
-    make_single_cache(speaker, '処理が終ったのだ。')
+    for text in CACHED_PHRASES:
+        make_single_cache(speaker, text)
     print('\nずんだもんの声のキャッシュがインストールされたのだ！')
 
 
-def _exception_hook(cls, er, tb):
-    if cls is FileNotFoundError:
-        zundamon_says(
-            f'{er.filename}というファイルやフォルダはないのだ。',
-            'そのようなファイルやフォルダはないのだ。',
-        )
-    elif cls is FileExistsError:
-        zundamon_says(
-            f'{er.filename}というファイルやフォルダが既にあるのだ。'
-            'そのようなファイルやフォルダは既にあるのだ。',
-        )
-    elif cls is IsADirectoryError:
-        zundamon_says(
-            f'{er.filename}はディレクトリなのだ。',
-            'それはディレクトリなのだ。',
-        )
-    elif cls is NotADirectoryError:
-        zundamon_says(
-            f'{er.filename}はディレクトリではないのだ。',
-            'それはディレクトリではないのだ。',
-        )
-    elif cls is PermissionError:
-        zundamon_says(
-            f'{er.filename}に対して十分なアクセス権がないのだ。',
-            '僕には十分なアクセス権がないのだ。',
-        )
-    elif cls is ProcessLookupError:
-        zundamon_says('プロセスが見付からないのだ。')
-    elif cls is TimeoutError:
-        zundamon_says('タイムアウトなのだ。')
-    elif cls is InterruptedError:
-        zundamon_says('中断するように言われたのだ。')
-    elif cls is ConnectionRefusedError:
-        zundamon_says('接続が拒否されたのだ。')
-    elif cls is ConnectionAbortedError:
-        zundamon_says('接続が中断されたのだ。')
-    elif cls is BrokenPipeError:
-        zundamon_says('パイプが壊れたのだ。')
-    elif cls is ChildProcessError:
-        zundamon_says('子プロセスが失敗したのだ。')
-    elif cls is BlockingIOError:
-        zundamon_says('非同期処理に失敗したのだ。')
-    elif cls is UnicodeEncodeError:
-        zundamon_says('ユニコードのエンコードに失敗したのだ。')
-    elif cls is UnicodeDecodeError:
-        zundamon_says('ユニコードのデコードに失敗したのだ。')
-    elif cls is UnboundLocalError:
-        zundamon_says('ローカル変数が変なのだ。')
-    elif cls is TypeError:
-        zundamon_says('型のエラーなのだ。')
-    elif cls is NameError:
-        zundamon_says(
-            f'{er.name}は定義されていないのだ。',
-            'それは定義されていないのだ。',
-        )
-    elif cls is ZeroDivisionError:
-        zundamon_says('ゼロで割り算をしてはいけないのだ。')
-    elif cls is OverflowError:
-        zundamon_says('オーバーフローなのだ。')
-    elif cls is ArithmeticError:
-        zundamon_says('数学的に間違いなのだ。')
-    elif cls is AssertionError:
-        zundamon_says('テストが失敗したようなのだ。')
-    elif cls is AttributeError:
-        zundamon_says('属性のエラーなのだ。')
-    elif cls is EOFError:
-        zundamon_says('文字が入力されなかったのだ。')
-    elif cls is ImportError:
-        zundamon_says(
-            f'{er.name}をインポートできなかったのだ。',
-            'インポートできなかったのだ。',
-        )
-    elif cls is ModuleNotFoundError:
-        zundamon_says(
-            f'{er.name}をインポートできなかったのだ。',
-            'インポートできなかったのだ。',
-        )
-    elif cls is IndexError:
-        zundamon_says('添字が範囲外なのだ。')
-    elif cls is KeyError:
-        zundamon_says('辞書のキーが違うのだ。')
-    elif cls is KeyboardInterrupt:
-        zundamon_says(
-            'ユーザーさんが中止しろって言ったからやめたのだ。'
-        )
-    elif cls is MemoryError:
-        zundamon_says('メモリー不足なのだ。')
-    elif cls is BufferError:
-        zundamon_says('バッファ関連のエラーなのだ。')
-    elif cls is LookupError:
-        zundamon_says('キーが違うのだ。')
-    elif cls is OSError:
-        zundamon_says('OS関連のエラーなのだ。')
-    elif cls is RecursionError:
-        zundamon_says('無限ループしていそうなのだ。')
-    elif cls is ReferenceError:
-        zundamon_says('既にガベコレされているのだ。')
-    elif cls is RuntimeError:
-        zundamon_says('何かよくわからないエラーなのだ。')
-    elif cls is IndentationError:
-        zundamon_says('インデントがおかしいのだ。')
-    elif cls is TabError:
-        zundamon_says('タブとスペースどっちかにすべきなのだ。')
-    elif cls is SystemError:
-        zundamon_says('インタプリタのエラーなのだ。')
-    elif cls is SyntaxError:
-        zundamon_says('文法が間違っているのだ。')
-    elif isinstance(er, ZundamonSays):
+# Exception class -> (message, backup message).
+# Message is formatted with the exception as 'er'.
+# Backup message is used if VOICEVOX ENGINE is not running
+# and so it must not depend on the exception.
+# It is looked up by MRO of raised exception and so subclasses
+# which is not written here use message of its parent.
+MESSAGES = {
+    FileNotFoundError: ('{er.filename}というファイルやフォルダはないのだ。',
+                        'そのようなファイルやフォルダはないのだ。'),
+    FileExistsError: ('{er.filename}というファイルやフォルダが既にあるのだ。',
+                      'そのようなファイルやフォルダは既にあるのだ。'),
+    IsADirectoryError: ('{er.filename}はディレクトリなのだ。',
+                        'それはディレクトリなのだ。'),
+    NotADirectoryError: ('{er.filename}はディレクトリではないのだ。',
+                         'それはディレクトリではないのだ。'),
+    PermissionError: ('{er.filename}に対して十分なアクセス権がないのだ。',
+                      '僕には十分なアクセス権がないのだ。'),
+    ProcessLookupError: ('プロセスが見付からないのだ。', None),
+    TimeoutError: ('タイムアウトなのだ。', None),
+    InterruptedError: ('中断するように言われたのだ。', None),
+    ConnectionRefusedError: ('接続が拒否されたのだ。', None),
+    ConnectionAbortedError: ('接続が中断されたのだ。', None),
+    BrokenPipeError: ('パイプが壊れたのだ。', None),
+    ChildProcessError: ('子プロセスが失敗したのだ。', None),
+    BlockingIOError: ('非同期処理に失敗したのだ。', None),
+    UnicodeEncodeError: ('ユニコードのエンコードに失敗したのだ。', None),
+    UnicodeDecodeError: ('ユニコードのデコードに失敗したのだ。', None),
+    UnboundLocalError: ('ローカル変数が変なのだ。', None),
+    TypeError: ('型のエラーなのだ。', None),
+    NameError: ('{er.name}は定義されていないのだ。',
+                'それは定義されていないのだ。'),
+    ZeroDivisionError: ('ゼロで割り算をしてはいけないのだ。', None),
+    OverflowError: ('オーバーフローなのだ。', None),
+    ArithmeticError: ('数学的に間違いなのだ。', None),
+    AssertionError: ('テストが失敗したようなのだ。', None),
+    AttributeError: ('属性のエラーなのだ。', None),
+    EOFError: ('文字が入力されなかったのだ。', None),
+    ImportError: ('{er.name}をインポートできなかったのだ。',
+                  'インポートできなかったのだ。'),
+    IndexError: ('添字が範囲外なのだ。', None),
+    KeyError: ('辞書のキーが違うのだ。', None),
+    KeyboardInterrupt: ('ユーザーさんが中止しろって言ったからやめたのだ。', None),
+    MemoryError: ('メモリー不足なのだ。', None),
+    BufferError: ('バッファ関連のエラーなのだ。', None),
+    LookupError: ('キーが違うのだ。', None),
+    OSError: ('OS関連のエラーなのだ。', None),
+    RecursionError: ('無限ループしていそうなのだ。', None),
+    ReferenceError: ('既にガベコレされているのだ。', None),
+    RuntimeError: ('何かよくわからないエラーなのだ。', None),
+    IndentationError: ('インデントがおかしいのだ。', None),
+    TabError: ('タブとスペースどっちかにすべきなのだ。', None),
+    SystemError: ('インタプリタのエラーなのだ。', None),
+    SyntaxError: ('文法が間違っているのだ。', None),
+    BaseException: ('何らかのエラーなのだ。', None),
+}
+END_MESSAGE = '処理が終ったのだ。'
+CACHED_PHRASES = list(dict.fromkeys(
+    chain((backup or message for message, backup in MESSAGES.values()),
+          [END_MESSAGE])))
+_dispatch_cache: Dict[type, Tuple[str, Optional[str]]] = {}
+
+
+def lookup_message(cls: type) -> Tuple[str, Optional[str]]:
+    '''
+    Get (message, backup message) of exception class.
+    The nearest class in MRO is used and the result is memorized.
+    '''
+    try:
+        return _dispatch_cache[cls]
+    except KeyError:
         pass
+    for parent in cls.__mro__:
+        if parent in MESSAGES:
+            result = MESSAGES[parent]
+            break
     else:
-        zundamon_says('何らかのエラーなのだ。')
+        result = MESSAGES[BaseException]
+    _dispatch_cache[cls] = result
+    return result
+
+
+def say_with_deadline(error_txt: str, backup_txt: Optional[str] = None,
+                      preload=True, deadline: Optional[float] = None):
+    '''
+    Call zundamon_says in background and wait at most deadline seconds.
+    Voices are spoken by a daemon thread started at import, so it never
+    blocks exit of python and no thread is started at exit.
+
+    deadline: Optional[float]
+        Seconds to wait. If None, DEADLINE of this module is used.
+    '''
+    print(error_txt)
+    done = Event()
+    _requests.put((error_txt, backup_txt, preload, done))
+    done.wait(DEADLINE if deadline is None else max(0.0, deadline))
+    return error_txt
+
+
+def _quiet_says(error_txt: str, backup_txt: Optional[str], preload: bool):
+    '''
+    Error while reporting error should not be shown.
+    '''
+    try:
+        zundamon_says(error_txt, backup_txt, preload, echo=False)
+    except Exception:
+        pass
+
+
+def _speak_requests() -> None:
+    while True:
+        error_txt, backup_txt, preload, done = _requests.get()
+        _quiet_says(error_txt, backup_txt, preload)
+        done.set()
+
+
+_requests: Queue = Queue()
+Thread(target=_speak_requests, daemon=True).start()
+
+
+def _exception_hook(cls, er, tb):
+    global _exit_time
+    if not isinstance(er, ZundamonSays):
+        message, backup = lookup_message(cls)
+        try:
+            text = message.format(er=er)
+        except AttributeError:
+            text = backup or message
+        _exit_time = time.monotonic() + DEADLINE
+        say_with_deadline(text, backup)
     traceback.print_exception(cls, er, tb)
 
 
+def _say_end() -> None:
+    '''
+    Say the end message. After an uncaught error, it waits only
+    the rest of DEADLINE of the error.
+    '''
+    if _exit_time is None:
+        say_with_deadline(END_MESSAGE, preload=False)
+        return None
+    remaining = _exit_time - time.monotonic()
+    if remaining > 0:
+        say_with_deadline(END_MESSAGE, preload=False, deadline=remaining)
+
+
 def install():
     try:
         print('🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛')
@@ -253,7 +256,7 @@ https://github.com/VOICEVOX/voicevox_engine/releases/latest
 
 sys.excepthook = _exception_hook
 atexit.register(print, '🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛')
-atexit.register(zundamon_says, '処理が終ったのだ。', preload=False)
+atexit.register(_say_end)
 atexit.register(print, '🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛🫛')
 
 
@@ -0,0 +1,59 @@
+'''
+Cache formats and broken cache files.
+'''
+import tempfile
+import unittest
+from pathlib import Path
+from ninvoicevox import CacheFormat, Speaker
+from ninvoicevox.fakeengine import FakeEngine
+from ninvoicevox.wav import parse_wav
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = FakeEngine().start()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.engine.stop()
+        self.directory.cleanup()
+
+    def speaker(self, cache_format=None, parallel=False) -> Speaker:
+        return Speaker(url=self.engine.url, preload=False, parallel=parallel,
+                       enable_cache=True, directory=self.directory.name,
+                       cache_format=cache_format)
+
+    def test_formats_are_loaded(self) -> None:
+        for cache_format in (None, CacheFormat('zlib'), CacheFormat('lzma')):
+            sound = self.speaker(cache_format).text('保存します。').get()
+            self.engine.counts.clear()
+            self.assertEqual(
+                self.speaker(cache_format).text('保存します。').get(), sound)
+            self.assertNotIn('synthesis', self.engine.counts)
+
+    def test_hit_and_miss_have_same_format(self) -> None:
+        cache_format = CacheFormat('zlib', mono=True, rate=16000)
+        fresh = parse_wav(self.speaker(cache_format).text('あいう。').get())
+        self.assertEqual((fresh.rate, fresh.channels), (16000, 1))
+        # The first voice is a hit and the second one is a miss.
+        wav = self.speaker(cache_format, parallel=True)\
+            .text('あいう。\nかきく。').render()
+        self.assertEqual(parse_wav(wav)[:3], fresh[:3])
+
+    def test_broken_cache_is_got_again(self) -> None:
+        speaker = self.speaker(CacheFormat('zlib'))
+        voice = speaker.text('壊れます。')
+        sound = voice.get()
+        path = Path(self.directory.name) / voice.make_fname()
+        path.write_bytes(path.read_bytes()[:10])
+        self.assertEqual(speaker.text('壊れます。').get(), sound)
+        self.assertEqual(self.speaker().text('壊れます。').get(), sound)
+        self.assertEqual(speaker.text('壊れます。').load_cache(), True)
+
+    def test_no_temporary_file_is_left(self) -> None:
+        self.speaker().text('一時ファイル。').get()
+        self.assertEqual(list(Path(self.directory.name).glob('*.tmp')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+'''
+Cancellation of voices against FakeEngine.
+'''
+import gc
+import time
+import unittest
+import weakref
+from concurrent.futures import CancelledError
+from ninvoicevox import Speaker
+from ninvoicevox.fakeengine import FakeEngine
+from ninvoicevox.talker import Talker
+
+
+class CancelTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = FakeEngine(synthesis_latency=1.0,
+                                 cancellable=True).start()
+
+    def tearDown(self) -> None:
+        self.engine.stop()
+
+    def wait_synthesis(self, api: str = 'synthesis') -> None:
+        for _ in range(100):
+            if self.engine.counts.get(api):
+                return None
+            time.sleep(0.01)
+        self.fail(f'{api} is not requested.')
+
+    def test_cancel_in_flight(self) -> None:
+        voice = Speaker(url=self.engine.url).text('キャンセルします。')
+        self.wait_synthesis()
+        t = time.monotonic()
+        self.assertTrue(voice.cancel())
+        self.assertTrue(voice.cancelled())
+        self.assertTrue(voice.done())
+        with self.assertRaises(CancelledError):
+            voice.get()
+        self.assertLess(time.monotonic() - t, 0.5)
+
+    def test_cancel_after_received(self) -> None:
+        voice = Speaker(url=self.engine.url, preload=False).text('はい。')
+        voice.get()
+        self.assertFalse(voice.cancel())
+        self.assertFalse(voice.cancelled())
+
+    def test_garbage_collected_voice_is_cancelled(self) -> None:
+        voice = Speaker(url=self.engine.url).text('捨てられます。')
+        job = voice._job
+        self.wait_synthesis()
+        del voice
+        gc.collect()
+        self.assertTrue(job.cancelled)
+        self.assertTrue(job.done.wait(0.5))
+        self.assertIsNone(job.sound)
+
+    def test_cancellable_synthesis(self) -> None:
+        voice = Speaker(url=self.engine.url,
+                        cancellable=True).text('止めます。')
+        self.wait_synthesis('cancellable_synthesis')
+        voice.cancel()
+        self.assertNotIn('synthesis', self.engine.counts)
+
+    def test_cancellable_falls_back_to_synthesis(self) -> None:
+        self.engine.cancellable = False
+        self.engine.synthesis_latency = 0.0
+        speaker = Speaker(url=self.engine.url, preload=False,
+                          cancellable=True)
+        self.assertEqual(speaker.text('はい。').get()[:4], b'RIFF')
+        self.assertFalse(speaker.cancellable)
+
+    def test_talker_is_freed_without_gc(self) -> None:
+        self.engine.synthesis_latency = 0.0
+        talker = Talker(self.engine.url, 'speakers')
+        self.assertTrue(talker.get())
+        ref = weakref.ref(talker)
+        gc.disable()
+        try:
+            del talker
+            self.assertIsNone(ref())
+        finally:
+            gc.enable()
+
+
+if __name__ == '__main__':
+    unittest.main()
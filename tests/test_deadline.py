@@ -0,0 +1,71 @@
+'''
+Deadlines and hedged requests against FakeEngine.
+'''
+import json
+import time
+import unittest
+from ninvoicevox import Speaker
+from ninvoicevox.fakeengine import FakeEngine
+from ninvoicevox.metrics import Metrics
+from ninvoicevox.talker import Talker, hedge
+
+
+class DeadlineTest(unittest.TestCase):
+    def test_deadline_raises_timeout(self) -> None:
+        with FakeEngine(synthesis_latency=1.0) as engine:
+            speaker = Speaker(url=engine.url, preload=False, deadline=0.2)
+            t = time.monotonic()
+            with self.assertRaises(TimeoutError):
+                speaker.text('間に合いません。').get()
+            self.assertLess(time.monotonic() - t, 0.8)
+
+    def test_voice_within_deadline(self) -> None:
+        with FakeEngine(latency=0.01) as engine:
+            speaker = Speaker(url=engine.url, preload=False, deadline=2.0)
+            self.assertEqual(speaker.text('間に合います。').get()[:4],
+                             b'RIFF')
+
+
+class HedgeTest(unittest.TestCase):
+    def test_hedge_uses_first_response(self) -> None:
+        with FakeEngine(latency=1.0) as slow, FakeEngine() as fast:
+            talkers = [Talker(slow.url, 'speakers'),
+                       Talker(fast.url, 'speakers')]
+            t = time.monotonic()
+            index, data = hedge(talkers, 0.05)
+            self.assertEqual(index, 1)
+            self.assertEqual(json.loads(data)[0]['name'], 'ずんだもん')
+            self.assertLess(time.monotonic() - t, 0.5)
+            self.assertTrue(talkers[0].cancelled)
+
+    def test_hedge_is_not_sent_before_delay(self) -> None:
+        with FakeEngine() as first, FakeEngine() as second:
+            index, _ = hedge([Talker(first.url, 'speakers'),
+                              Talker(second.url, 'speakers')], 1.0)
+            self.assertEqual(index, 0)
+            self.assertNotIn('speakers', second.counts)
+
+    def test_hedge_timeout(self) -> None:
+        with FakeEngine(latency=1.0) as engine:
+            with self.assertRaises(TimeoutError):
+                hedge([Talker(engine.url, 'speakers'),
+                       Talker(engine.url, 'speakers')], 0.05, 0.2)
+
+    def test_speaker_hedges_slow_synthesis(self) -> None:
+        with FakeEngine(synthesis_latency=1.0) as slow,\
+                FakeEngine() as fast:
+            metrics = Metrics()
+            speaker = Speaker(url=slow.url, preload=False,
+                              hedge_percentile=0.5, hedge_urls=[fast.url],
+                              metrics=metrics)
+            for _ in range(speaker.latency.minimum):
+                speaker.latency.add(0.05)
+            t = time.monotonic()
+            self.assertEqual(speaker.text('急ぎます。').get()[:4], b'RIFF')
+            self.assertLess(time.monotonic() - t, 0.8)
+            self.assertEqual(metrics.summary()['hedge_wins']['max'], 1.0)
+            self.assertEqual(fast.counts['synthesis'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
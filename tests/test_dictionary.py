@@ -0,0 +1,146 @@
+'''
+Dictionary.sync and invalidation of cache by words.
+'''
+import tempfile
+import unittest
+from pathlib import Path
+from ninvoicevox import Speaker
+from ninvoicevox.cache import DICTIONARY_INDEX, DictionaryIndex
+from ninvoicevox.fakeengine import FakeEngine
+from ninvoicevox.voice import Dictionary, Word, load_words
+
+
+class DictionaryTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = FakeEngine().start()
+        self.directory = tempfile.TemporaryDirectory()
+        self.dictionary = Dictionary(
+            self.engine.url, cache_directories=[self.directory.name])
+
+    def tearDown(self) -> None:
+        self.engine.stop()
+        self.directory.cleanup()
+
+    def words(self) -> dict:
+        return {word['surface']: word
+                for word in self.dictionary.get().values()}
+
+    def cached(self, speaker: Speaker, text: str) -> Path:
+        voice = speaker.text(text)
+        voice.get()
+        return speaker.directory / voice.make_fname()
+
+    def test_sync(self) -> None:
+        self.dictionary.add('古い', 'フルイ', 1)
+        self.dictionary.add('変わる', 'カワル', 1)
+        result = self.dictionary.sync([Word('変わる', 'カワール', 2),
+                                       Word('新しい', 'アタラシイ', 1)])
+        self.assertEqual(result[self.engine.url],
+                         dict(added=1, updated=1, deleted=1))
+        words = self.words()
+        self.assertEqual(sorted(words), sorted(['変わる', '新しい']))
+        self.assertEqual(words['変わる']['pronunciation'], 'カワール')
+        # Nothing is sent when dictionary is the same.
+        self.assertEqual(self.dictionary.sync([
+            Word('変わる', 'カワール', 2), Word('新しい', 'アタラシイ', 1)
+        ])[self.engine.url], dict(added=0, updated=0, deleted=0))
+
+    def test_sync_keeps_words(self) -> None:
+        self.dictionary.add('残す', 'ノコス', 1)
+        self.dictionary.sync([Word('足す', 'タス', 1)], prune=False)
+        self.assertEqual(sorted(self.words()), sorted(['足す', '残す']))
+
+    def test_sync_word_type(self) -> None:
+        self.dictionary.sync([Word('走る', 'ハシル', 2)])
+        result = self.dictionary.sync([Word('走る', 'ハシル', 2, 'VERB')])
+        self.assertEqual(result[self.engine.url]['updated'], 1)
+        self.assertEqual(self.words()['走る']['part_of_speech'], '動詞')
+
+    def test_sync_to_many_servers(self) -> None:
+        with FakeEngine() as other:
+            result = self.dictionary.sync([Word('二つ', 'フタツ', 1)],
+                                          [self.engine.url, other.url])
+            self.assertEqual(result[other.url]['added'], 1)
+            self.assertEqual(len(other.user_dict), 1)
+
+    def test_load_words(self) -> None:
+        path = Path(self.directory.name) / 'words.csv'
+        path.write_text('# surface,pronunciation,accent_type\n'
+                        '単語,タンゴ,1\n動く,ウゴク,2,VERB,7\n',
+                        encoding='utf-8')
+        self.assertEqual(load_words(path), [
+            Word('単語', 'タンゴ', 1), Word('動く', 'ウゴク', 2, 'VERB', 7)])
+
+    def test_unknown_word_type(self) -> None:
+        path = Path(self.directory.name) / 'words.csv'
+        path.write_text('単語,タンゴ,1\n変,ヘン,1,BADTYPE\n',
+                        encoding='utf-8')
+        with self.assertRaisesRegex(ValueError, r"'変'.*line 2"):
+            load_words(path)
+        path = Path(self.directory.name) / 'words.json'
+        path.write_text('[{"surface": "変", "pronunciation": "ヘン", '
+                        '"accent_type": 1, "word_type": "BADTYPE"}]',
+                        encoding='utf-8')
+        with self.assertRaisesRegex(ValueError, r"'変'.*item 1"):
+            load_words(path)
+        with self.assertRaisesRegex(ValueError, "'変'"):
+            self.dictionary.sync([Word('変', 'ヘン', 1, 'BADTYPE')])
+        self.assertEqual(self.dictionary.get(), {})
+
+    def test_invalidate_only_voices_with_word(self) -> None:
+        self.dictionary.add('ずんだ', 'ズンダ', 1)
+        speaker = Speaker(url=self.engine.url, preload=False,
+                          enable_cache=True, directory=self.directory.name)
+        with_word = self.cached(speaker, 'ずんだ餅です。')
+        without_word = self.cached(speaker, 'お餅です。')
+        word_id = next(iter(self.dictionary.get()))
+        self.dictionary.update(word_id, 'ずんだ', 'ズンダー', 1).get()
+        self.assertFalse(with_word.exists())
+        self.assertTrue(without_word.exists())
+
+    def test_failed_sync_invalidates_changed_words(self) -> None:
+        self.dictionary.add('ずんだ', 'ズンダ', 1)
+        self.dictionary.add('消える', 'キエル', 1)
+        speaker = Speaker(url=self.engine.url, preload=False,
+                          enable_cache=True, directory=self.directory.name)
+        with_word = self.cached(speaker, 'ずんだ餅です。')
+        # The word is already deleted by someone else.
+        delete_talker = self.dictionary._delete_talker
+        self.dictionary._delete_talker = \
+            lambda word_id, url: delete_talker('missing', url)
+        with self.assertRaises(Exception):
+            self.dictionary.sync([Word('ずんだ', 'ズンダー', 1)])
+        self.assertFalse(with_word.exists())
+        self.assertEqual(speaker.user_dict()['ずんだ'][0], 'ズンダー')
+
+    def test_broken_index_is_ignored(self) -> None:
+        self.dictionary.add('ずんだ', 'ズンダ', 1)
+        speaker = Speaker(url=self.engine.url, preload=False,
+                          enable_cache=True, directory=self.directory.name)
+        first = self.cached(speaker, 'ずんだ餅です。')
+        index = Path(self.directory.name) / DICTIONARY_INDEX
+        with open(index, 'a', encoding='utf-8') as fp:
+            # Line of a process killed while writing.
+            fp.write('\n["broken", ["ずん')
+        second = self.cached(speaker, 'ずんだ餅なのだ。')
+        self.assertEqual(DictionaryIndex(self.directory.name).invalidate(
+            ['ずんだ']), 2)
+        self.assertFalse(first.exists() or second.exists())
+
+    def test_speaker_gets_changed_dictionary(self) -> None:
+        self.dictionary.add('ずんだ', 'ズンダ', 1)
+        speaker = Speaker(url=self.engine.url, preload=False,
+                          enable_cache=True, directory=self.directory.name)
+        old = self.cached(speaker, 'ずんだ餅です。')
+        word_id = next(iter(self.dictionary.get()))
+        self.dictionary.update(word_id, 'ずんだ', 'ズンダー', 1).get()
+        self.assertEqual(speaker.user_dict()['ずんだ'][0], 'ズンダー')
+        new = self.cached(speaker, 'ずんだ餅です。')
+        self.assertNotEqual(old, new)
+        self.dictionary.delete(word_id).get()
+        self.assertEqual(speaker.user_dict(), {})
+        self.assertFalse(new.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+'''
+Concurrent voices of many texts by Speaker.map.
+'''
+import time
+import unittest
+from typing import Iterator, List
+from ninvoicevox import Speaker
+from ninvoicevox.fakeengine import FakeEngine
+from ninvoicevox.wav import Processor
+
+TEXTS = [f'{n}番目の文です。' for n in range(10)]
+
+
+class SlowEngine(FakeEngine):
+    '''
+    FakeEngine which is slow to synthesize text containing slow.
+    '''
+    slow = '遅'
+
+    def synthesis(self, query: dict, speaker: int) -> bytes:
+        if self.slow in query['text']:
+            time.sleep(0.5)
+        return super().synthesis(query, speaker)
+
+
+class MapTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = SlowEngine().start()
+        self.speaker = Speaker(url=self.engine.url, preload=False)
+        self.consumed = 0
+
+    def tearDown(self) -> None:
+        self.engine.stop()
+
+    def texts(self, texts: List[str]) -> Iterator[str]:
+        for text in texts:
+            self.consumed += 1
+            yield text
+
+    def test_ordered(self) -> None:
+        texts = ['遅い文です。'] + TEXTS
+        result = list(self.speaker.map(texts, concurrency=3))
+        self.assertEqual([text for text, _ in result], texts)
+        for text, wav in result:
+            self.assertEqual(wav, self.speaker.text(text).get())
+
+    def test_unordered(self) -> None:
+        texts = ['遅い文です。'] + TEXTS[:3]
+        result = [text for text, _ in self.speaker.map(
+            texts, concurrency=4, ordered=False)]
+        self.assertEqual(sorted(result), sorted(texts))
+        self.assertEqual(result[-1], '遅い文です。')
+
+    def test_window_is_bounded(self) -> None:
+        results = self.speaker.map(self.texts(TEXTS * 3), concurrency=2)
+        for done, _ in enumerate(results, 1):
+            # Texts are read only for four voices waiting to be yielded.
+            self.assertLessEqual(self.consumed, done + 4)
+        self.assertEqual(self.consumed, 30)
+
+    def test_closed_early(self) -> None:
+        results = self.speaker.map(self.texts(TEXTS), concurrency=2)
+        next(results)
+        results.close()
+        self.assertLessEqual(self.consumed, 5)
+
+    def test_postprocess_in_processes(self) -> None:
+        speaker = Speaker(url=self.engine.url, preload=False,
+                          postprocess=Processor(loudness=-20.0))
+        result = dict(speaker.map(TEXTS[:3], processes=2))
+        for text in TEXTS[:3]:
+            self.assertEqual(result[text], speaker.text(text).get())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+'''
+Parsing of inline markup by markup.parse_markup.
+'''
+import unittest
+from ninvoicevox.dialogue import Line
+from ninvoicevox.markup import parse_markup
+
+
+class MarkupTest(unittest.TestCase):
+    def test_plain_text_is_split_at_punctuations(self) -> None:
+        self.assertEqual(parse_markup('か。\nき、く', sep=0.2), [
+            Line(1, 'か。', {}, 0.2), Line(1, 'き、', {}, 0.2),
+            Line(1, 'く', {}, 0.0)])
+
+    def test_pause_replaces_sep(self) -> None:
+        self.assertEqual(parse_markup('はじめます。[pause=800]次です。'), [
+            Line(1, 'はじめます。', {}, 0.8), Line(1, '次です。', {}, 0.4)])
+
+    def test_pauses_are_added(self) -> None:
+        lines = parse_markup('え。[pause=100][pause=200]お。')
+        self.assertAlmostEqual(lines[0].pause, 0.3)
+
+    def test_pause_at_start_is_ignored(self) -> None:
+        self.assertEqual(parse_markup('[pause=300]あ。'),
+                         [Line(1, 'あ。', {}, 0.4)])
+
+    def test_nested_prosody(self) -> None:
+        self.assertEqual(
+            parse_markup('[speed=1.2][pitch=-0.1]い、[/pitch]う[/speed]え'),
+            [Line(1, 'い、', {'speed_scale': 1.2, 'pitch_scale': -0.1}, 0.4),
+             Line(1, 'う', {'speed_scale': 1.2}, 0.0),
+             Line(1, 'え', {}, 0.0)])
+
+    def test_same_attribute_is_nested(self) -> None:
+        self.assertEqual(
+            parse_markup('[volume=2][volume=0.5]小さい。[/volume]大きい。'
+                         '[/volume]'),
+            [Line(1, '小さい。', {'volume_scale': 0.5}, 0.4),
+             Line(1, '大きい。', {'volume_scale': 2.0}, 0.4)])
+
+    def test_speaker(self) -> None:
+        self.assertEqual(
+            parse_markup('[speaker=2]え。[/speaker]お！？', speaker_id=3),
+            [Line(2, 'え。', {}, 0.4), Line(3, 'お！？', {}, 0.4)])
+
+    def test_only_punctuation_is_not_a_line(self) -> None:
+        self.assertEqual(parse_markup('あ[pause=200]。、いう'),
+                         [Line(1, 'あ', {}, 0.2), Line(1, 'いう', {}, 0.0)])
+
+    def test_errors(self) -> None:
+        for text in ('[pause]あ', 'あ[/pause=100]', '[/speed]あ',
+                     '[speed]あ[/speed]'):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    parse_markup(text)
+
+    def test_unknown_tag_is_text(self) -> None:
+        self.assertEqual(parse_markup('[bold]あ'),
+                         [Line(1, '[bold]あ', {}, 0.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
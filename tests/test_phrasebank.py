@@ -0,0 +1,78 @@
+'''
+PhraseBank in memory, loaded from voicevox and saved to a file.
+'''
+import tempfile
+import unittest
+from pathlib import Path
+from ninvoicevox import PhraseBank, Speaker
+from ninvoicevox.fakeengine import FakeEngine
+from ninvoicevox.wav import make_wav, parse_wav
+
+PHRASES = {'start': '処理が始まりました。', 'end': '処理が終わりました。',
+           'begin': '処理が始まりました。'}
+
+
+class PhraseBankTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.directory.name) / 'phrases.wav')
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_load_save_and_open(self) -> None:
+        with FakeEngine() as engine:
+            speaker = Speaker(url=engine.url, preload=False)
+            bank = PhraseBank.load(speaker, PHRASES)
+            # The same text is got once.
+            self.assertEqual(engine.counts['synthesis'], 2)
+            expected = {key: speaker.text(text).get()
+                        for key, text in PHRASES.items()}
+        self.assertEqual(bank.index['start'], bank.index['begin'])
+        for key, wav in expected.items():
+            self.assertEqual(bank.wav(key), wav)
+        bank.save(self.path)
+        bank.close()
+        with PhraseBank.open(self.path) as opened:
+            self.assertEqual(sorted(opened.keys()), sorted(PHRASES))
+            for key, wav in expected.items():
+                self.assertEqual(opened.wav(key), wav)
+                self.assertEqual(opened.info(key)[:3], parse_wav(wav)[:3])
+            with self.assertRaises(ValueError):
+                opened.add('more', expected['end'])
+
+    def test_saved_file_is_wav_of_all_phrases(self) -> None:
+        bank = PhraseBank()
+        bank.add('a', make_wav(b'\1\0\2\0', 8000, 1))
+        bank.add(['b', 'c'], make_wav(b'\3\0', 8000, 1))
+        bank.save(self.path)
+        data = Path(self.path).read_bytes()
+        info = parse_wav(data)
+        self.assertEqual(data[info.offset:info.offset + info.length],
+                         b'\1\0\2\0\3\0')
+        with PhraseBank.open(self.path) as opened:
+            self.assertEqual(bytes(opened['c']), b'\3\0')
+            self.assertEqual(len(opened), 3)
+
+    def test_odd_length_is_padded(self) -> None:
+        bank = PhraseBank()
+        bank.add('odd', make_wav(b'\x80\x81\x82', 8000, 1, 1))
+        bank.save(self.path)
+        with PhraseBank.open(self.path) as opened:
+            self.assertEqual(bytes(opened['odd']), b'\x80\x81\x82')
+            self.assertEqual(opened.format, (8000, 1, 1))
+
+    def test_other_format_is_rejected(self) -> None:
+        bank = PhraseBank()
+        bank.add('a', make_wav(b'\0\0', 8000, 1))
+        with self.assertRaises(ValueError):
+            bank.add('b', make_wav(b'\0\0', 16000, 1))
+
+    def test_plain_wav_is_not_opened(self) -> None:
+        Path(self.path).write_bytes(make_wav(b'\0\0', 8000, 1))
+        with self.assertRaisesRegex(ValueError, 'not PhraseBank'):
+            PhraseBank.open(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
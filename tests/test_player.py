@@ -0,0 +1,61 @@
+'''
+PersistentPlayer with programs which play in real time or die.
+'''
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from ninvoicevox.player import PersistentPlayer
+from ninvoicevox.wav import make_wav
+
+RATE = 24000
+# Read PCM of 16 bit mono at the rate like a sound device.
+REALTIME = f'''
+import sys, time
+start = time.monotonic()
+done = 0
+while True:
+    chunk = sys.stdin.buffer.read({RATE // 10 * 2})
+    if not chunk:
+        break
+    done += len(chunk)
+    time.sleep(max(0, start + done / {RATE * 2} - time.monotonic()))
+'''
+
+
+def clip(seconds: float) -> bytes:
+    return make_wav(bytes(int(RATE * seconds) * 2), RATE, 1)
+
+
+class PersistentPlayerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_returns_before_end(self) -> None:
+        # Each clip is larger than pipe buffer, so writing blocks.
+        with PersistentPlayer(
+                lambda info: [sys.executable, '-c', REALTIME]) as player:
+            started = time.monotonic()
+            player.play(clip(2))
+            first = time.monotonic() - started
+            player.play(clip(2))
+            second = time.monotonic() - started
+        self.assertLess(first, 2.2)
+        self.assertLess(second, 4.2)
+
+    def test_dead_program_is_started_again(self) -> None:
+        log = Path(self.directory.name) / 'started'
+        dying = f'open({str(log)!r}, "a").write("x"); '\
+            'import sys; sys.stdin.buffer.read(100)'
+        with PersistentPlayer(
+                lambda info: [sys.executable, '-c', dying]) as player:
+            player.play(clip(2))
+        self.assertEqual(log.read_text(), 'xx')
+
+
+if __name__ == '__main__':
+    unittest.main()
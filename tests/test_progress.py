@@ -0,0 +1,75 @@
+'''
+Spoken progress of a loop by Speaker.progress.
+'''
+import time
+import unittest
+from typing import List
+from ninvoicevox import Speaker
+from ninvoicevox.fakeengine import FakeEngine
+from ninvoicevox.player import Player
+
+MESSAGE = '{}パーセント終わりました。'
+
+
+class RecordingPlayer(Player):
+    '''
+    Keep played voices instead of playing them.
+    '''
+
+    def __init__(self) -> None:
+        self.played: List[bytes] = []
+
+    def play(self, wav: bytes) -> None:
+        self.played.append(wav)
+
+
+class ProgressTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = FakeEngine().start()
+        self.speaker = Speaker(url=self.engine.url, preload=False)
+        self.player = RecordingPlayer()
+
+    def tearDown(self) -> None:
+        self.engine.stop()
+
+    def voice(self, percent: str) -> bytes:
+        return self.speaker.text(MESSAGE.format(percent)).get()
+
+    def iterate(self, progress, spoken_at: int) -> None:
+        # Wait the first message, which is reached at item spoken_at,
+        # because only the latest message is kept while it is spoken.
+        for n in progress:
+            if n == spoken_at:
+                while not self.player.played:
+                    time.sleep(0.01)
+
+    def test_items_are_passed(self) -> None:
+        self.assertEqual(list(self.speaker.progress(
+            range(7), every=50, command=self.player)), list(range(7)))
+
+    def test_milestones_in_interval_are_skipped(self) -> None:
+        self.iterate(self.speaker.progress(range(10), every=10, interval=100,
+                                       command=self.player), 1)
+        self.assertEqual(self.player.played,
+                         [self.voice('10'), self.voice('100')])
+
+    def test_only_latest_milestone_is_spoken(self) -> None:
+        self.iterate(self.speaker.progress(range(4), every=25, interval=0,
+                                       command=self.player), 1)
+        self.assertEqual(self.player.played,
+                         [self.voice('25'), self.voice('100')])
+
+    def test_voice_is_received_once(self) -> None:
+        self.engine.synthesis_latency = 0.3
+        self.iterate(self.speaker.progress(range(2), every=50, interval=0,
+                                       command=self.player), 1)
+        self.assertEqual(len(self.player.played), 2)
+        self.assertEqual(self.engine.counts['synthesis'], 2)
+
+    def test_total_is_needed(self) -> None:
+        with self.assertRaises(ValueError):
+            self.speaker.progress(iter(range(3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+'''
+Resumable rendering of long text by Voices.render_file.
+'''
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from ninvoicevox import Speaker
+from ninvoicevox.fakeengine import FakeEngine
+from ninvoicevox.wav import Processor
+
+TEXT = '一行目です\n二行目です\n三行目は失敗します\n四行目です'
+
+
+class FailingEngine(FakeEngine):
+    '''
+    FakeEngine which fails to synthesize text containing failing.
+    '''
+    failing = '失敗'
+
+    def synthesis(self, query: dict, speaker: int) -> bytes:
+        if self.failing and self.failing in query['text']:
+            raise RuntimeError('Synthesis failed.')
+        return super().synthesis(query, speaker)
+
+
+class RenderFileTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = FailingEngine().start()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / 'out.wav'
+        self.checkpoint = Path(str(self.path) + '.checkpoint')
+
+    def tearDown(self) -> None:
+        self.engine.stop()
+        self.directory.cleanup()
+
+    def speaker(self) -> Speaker:
+        return Speaker(url=self.engine.url, parallel=True)
+
+    def test_render_file_is_same_as_render(self) -> None:
+        self.engine.failing = None
+        voices = self.speaker().text(TEXT)
+        voices.render_file(self.path)
+        self.assertEqual(self.path.read_bytes(),
+                         self.speaker().text(TEXT).render())
+        self.assertFalse(self.checkpoint.exists())
+        # Written voices are not kept in memory.
+        self.assertTrue(all(voice.sound is None for voice in voices.voices))
+
+    def test_resume(self) -> None:
+        with self.assertRaises(Exception):
+            self.speaker().text(TEXT).render_file(self.path)
+        self.assertTrue(self.checkpoint.exists())
+        self.engine.failing = None
+        self.engine.counts.clear()
+        voices = self.speaker().text(TEXT)
+        voices.render_file(self.path)
+        # Voices written before the failure are not got again.
+        written = next(num for num, voice in enumerate(voices.voices)
+                       if '失敗' in voice.text)
+        self.assertEqual(self.engine.counts['synthesis'],
+                         len(voices.voices) - written)
+        self.assertFalse(self.checkpoint.exists())
+        self.assertEqual(self.path.read_bytes(),
+                         self.speaker().text(TEXT).render())
+
+    def test_checkpoint_of_other_text_is_ignored(self) -> None:
+        with self.assertRaises(Exception):
+            self.speaker().text(TEXT).render_file(self.path)
+        self.engine.failing = None
+        other = '別の文章です\n' + TEXT
+        voices = self.speaker().text(other)
+        self.engine.counts.clear()
+        voices.render_file(self.path)
+        self.assertEqual(self.engine.counts['synthesis'],
+                         len(voices.voices))
+        self.assertEqual(self.path.read_bytes(),
+                         self.speaker().text(other).render())
+
+    def test_checkpoint_of_other_options_is_ignored(self) -> None:
+        for sep, postprocess in ((0.2, None), (0.4, Processor())):
+            with self.subTest(sep=sep, postprocess=postprocess):
+                self.engine.failing = '四行目'
+                with self.assertRaises(Exception):
+                    self.speaker().text(TEXT).render_file(self.path)
+                self.engine.failing = None
+                self.engine.counts.clear()
+                speaker = Speaker(url=self.engine.url, parallel=True,
+                                  postprocess=postprocess)
+                voices = speaker.text(TEXT)
+                voices.render_file(self.path, sep)
+                self.assertEqual(self.engine.counts['synthesis'],
+                                 len(voices.voices))
+                self.assertEqual(self.path.read_bytes(),
+                                 speaker.text(TEXT).render(sep=sep))
+
+    def test_resume_with_markup_is_rejected(self) -> None:
+        task = subprocess.run(
+            [sys.executable, '-c', 'from ninvoicevox.main_command import '
+             'main; main()', '-u', self.engine.url, '-o', str(self.path),
+             '-r', '-m', 'テキスト'], capture_output=True, text=True)
+        self.assertEqual(task.returncode, 2)
+        self.assertIn('-m/--markup', task.stderr)
+        self.assertFalse(self.path.exists())
+
+    def test_truncated_file_is_resumed(self) -> None:
+        with self.assertRaises(Exception):
+            self.speaker().text(TEXT).render_file(self.path)
+        # Bytes written after the checkpoint are cut.
+        with open(self.path, 'ab') as fp:
+            fp.write(os.urandom(1000))
+        self.engine.failing = None
+        self.speaker().text(TEXT).render_file(self.path)
+        self.assertEqual(self.path.read_bytes(),
+                         self.speaker().text(TEXT).render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+'''
+Single-pass text normalization by terms.Normalizer.
+'''
+import unittest
+from ninvoicevox.terms import (READING_RULES, ZUNDA_FOOTER, ZUNDA_RULES,
+                               Normalizer, change_style)
+
+TEXTS = [
+    'これはテストなのです。',
+    '雨は降りませんでした。',
+    '昨日は晴れました。今日は曇っています。',
+    '明日は寒いです。でも元気です。',
+    'ですます調ではない文',
+    '',
+]
+
+
+def change_style_by_replace(text: str) -> str:
+    # change_style before the rules were joined into one pass.
+    for zf in ZUNDA_FOOTER:
+        text = text.replace(*zf)
+    return text
+
+
+class NormalizerTest(unittest.TestCase):
+    def test_same_as_replace_one_by_one(self) -> None:
+        normalizer = Normalizer(ZUNDA_RULES)
+        for text in TEXTS:
+            with self.subTest(text=text):
+                self.assertEqual(normalizer(text),
+                                 change_style_by_replace(text))
+                self.assertEqual(change_style(text),
+                                 change_style_by_replace(text))
+
+    def test_reading_rules(self) -> None:
+        normalizer = Normalizer(READING_RULES)
+        self.assertEqual(normalizer('2024/1/05に開始'), '2024年1月5日に開始')
+        self.assertEqual(normalizer('09:05:30.12に終了'), '9時5分30秒に終了')
+        self.assertEqual(normalizer('1,234,567円'), '1234567円')
+        self.assertEqual(normalizer('番号1234567890123'),
+                         '番号イチ ニ サン ヨン ゴ ロク ナナ ハチ キュウ '
+                         'ゼロ イチ ニ サン')
+        self.assertEqual(normalizer('詳細はhttps://example.com/a?b=1を参照'),
+                         '詳細はユーアールエル')
+        self.assertEqual(normalizer('commit 1e1d5720ab 完了'), 'commit  完了')
+        self.assertEqual(normalizer('見出し====本文'), '見出し 本文')
+
+    def test_groups_of_each_rule(self) -> None:
+        normalizer = Normalizer()\
+            .add(r'(a)(b)', lambda m: m.group(2) + m.group(1))\
+            .add(r'(c)', lambda m: m.group(1).upper())
+        self.assertEqual(normalizer('abc'), 'baC')
+
+    def test_earlier_rule_wins(self) -> None:
+        normalizer = Normalizer([(r'ab', '1'), (r'a', '2')])
+        self.assertEqual(normalizer('aab'), '21')
+
+    def test_stream_is_same_as_whole_text(self) -> None:
+        normalizer = Normalizer(ZUNDA_RULES + READING_RULES)
+        text = '2024-01-05です。\n12:30に来ました。\n最後です。'
+        chunks = [text[i:i + 3] for i in range(0, len(text), 3)]
+        self.assertEqual(''.join(normalizer.stream(chunks)),
+                         normalizer(text))
+
+    def test_no_rules(self) -> None:
+        self.assertEqual(Normalizer()('です。'), 'です。')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+'''
+Trimming and loudness of WAV by wav.Processor.
+'''
+import math
+import unittest
+from array import array
+from ninvoicevox.wav import (Processor, make_wav, normalize_loudness,
+                             parse_wav, trim_silence)
+
+RATE = 24000
+
+
+def pcm(*samples: int) -> bytes:
+    return array('h', samples).tobytes()
+
+
+def rms(data: bytes) -> float:
+    samples = array('h', data)
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class TrimTest(unittest.TestCase):
+    def test_silence_at_both_ends_is_removed(self) -> None:
+        self.assertEqual(
+            trim_silence(pcm(0, 100, -100, 5000, 0, -6000, 30, 0), 1),
+            pcm(5000, 0, -6000))
+
+    def test_stereo_is_trimmed_by_frame(self) -> None:
+        # Right channel of the first frame is loud.
+        self.assertEqual(
+            trim_silence(pcm(0, 0, 10, 3000, 0, 0, -4000, 0, 0, 0), 2),
+            pcm(10, 3000, 0, 0, -4000, 0))
+
+    def test_all_silence_becomes_empty(self) -> None:
+        self.assertEqual(trim_silence(pcm(0, 100, -200, 0), 1), b'')
+
+    def test_threshold(self) -> None:
+        data = pcm(0, 1000, 5000, 1000, 0)
+        self.assertEqual(trim_silence(data, 1, 512), pcm(1000, 5000, 1000))
+        self.assertEqual(trim_silence(data, 1, 2048), pcm(5000))
+
+
+class LoudnessTest(unittest.TestCase):
+    def test_rms_becomes_target(self) -> None:
+        data = pcm(*(1000 if n % 2 else -1000 for n in range(1000)))
+        self.assertAlmostEqual(
+            20 * math.log10(rms(normalize_loudness(data, -20.0)) / 32767),
+            -20.0, delta=0.01)
+
+    def test_peak_is_limited(self) -> None:
+        # One spike makes the gain limited by peak instead of RMS.
+        data = pcm(10000, *([10] * 999))
+        loud = array('h', normalize_loudness(data, -10.0, peak=-1.0))
+        self.assertAlmostEqual(max(loud), 32767 * 10 ** (-1 / 20), delta=1)
+
+    def test_silence_is_not_changed(self) -> None:
+        self.assertEqual(normalize_loudness(pcm(0, 0, 0)), pcm(0, 0, 0))
+        self.assertEqual(normalize_loudness(b''), b'')
+
+
+class ProcessorTest(unittest.TestCase):
+    def test_trim_and_pad(self) -> None:
+        wav = make_wav(pcm(0, 0, 5000, -5000, 0), RATE, 1)
+        processed = Processor(pad=0.001)(wav)
+        info = parse_wav(processed)
+        pad = pcm(*([0] * 24))
+        self.assertEqual(info[:3], (RATE, 1, 2))
+        self.assertEqual(processed[info.offset:],
+                         pad + pcm(5000, -5000) + pad)
+
+    def test_loudness_without_trim(self) -> None:
+        wav = make_wav(pcm(0, 1000, -1000, 0), RATE, 1)
+        processed = Processor(trim=False, loudness=-20.0)(wav)
+        info = parse_wav(processed)
+        self.assertEqual(info.length, 8)
+        self.assertGreater(rms(processed[info.offset:]), rms(wav[44:]))
+
+    def test_other_width_is_not_changed(self) -> None:
+        wav = make_wav(bytes([128, 128, 200, 128]), RATE, 1, 1)
+        self.assertEqual(Processor(loudness=-20.0)(wav), wav)
+
+    def test_repr_has_all_options(self) -> None:
+        self.assertEqual(repr(Processor(False, 256, -16.0, 0.2)),
+                         'Processor(trim=False, threshold=256, '
+                         'loudness=-16.0, pad=0.2)')
+
+
+if __name__ == '__main__':
+    unittest.main()
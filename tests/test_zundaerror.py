@@ -0,0 +1,80 @@
+'''
+Messages of zundaerror and time to wait them.
+'''
+import atexit
+import sys
+import time
+import unittest
+from ninvoicevox import zundaerror
+from ninvoicevox.zundaerror import MESSAGES, lookup_message
+
+# Importing zundaerror installs hooks, which are not used by tests.
+sys.excepthook = sys.__excepthook__
+atexit.unregister(zundaerror._say_end)
+
+
+class LookupMessageTest(unittest.TestCase):
+    def test_class_in_messages(self) -> None:
+        for cls in (FileNotFoundError, KeyError, OSError, BaseException):
+            self.assertIs(lookup_message(cls), MESSAGES[cls])
+
+    def test_nearest_parent_is_used(self) -> None:
+        class MyKeyError(KeyError):
+            pass
+        self.assertIs(lookup_message(MyKeyError), MESSAGES[KeyError])
+        self.assertIs(lookup_message(ModuleNotFoundError),
+                      MESSAGES[ImportError])
+        # ConnectionResetError -> ConnectionError -> OSError
+        self.assertIs(lookup_message(ConnectionResetError), MESSAGES[OSError])
+
+    def test_subclass_before_parent(self) -> None:
+        self.assertIsNot(lookup_message(ZeroDivisionError),
+                         MESSAGES[ArithmeticError])
+        self.assertIs(lookup_message(FloatingPointError),
+                      MESSAGES[ArithmeticError])
+
+    def test_unknown_exception(self) -> None:
+        class Unknown(Exception):
+            pass
+        self.assertIs(lookup_message(Unknown), MESSAGES[BaseException])
+
+    def test_result_is_memorized(self) -> None:
+        class Memorized(ValueError):
+            pass
+        lookup_message(Memorized)
+        self.assertIn(Memorized, zundaerror._dispatch_cache)
+
+    def test_backup_does_not_use_exception(self) -> None:
+        for message, backup in MESSAGES.values():
+            self.assertNotIn('{', backup or message)
+
+
+class DeadlineTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.says = zundaerror.zundamon_says
+        self.deadline = zundaerror.DEADLINE
+        zundaerror.zundamon_says = lambda *args, **kwargs: time.sleep(1.0)
+        zundaerror.DEADLINE = 0.3
+
+    def tearDown(self) -> None:
+        zundaerror.zundamon_says = self.says
+        zundaerror.DEADLINE = self.deadline
+        zundaerror._exit_time = None
+
+    def test_error_and_end_share_deadline(self) -> None:
+        t = time.monotonic()
+        try:
+            raise KeyError('key')
+        except KeyError as er:
+            zundaerror._exception_hook(KeyError, er, er.__traceback__)
+        zundaerror._say_end()
+        self.assertLess(time.monotonic() - t, 0.5)
+
+    def test_say_with_deadline(self) -> None:
+        t = time.monotonic()
+        zundaerror.say_with_deadline('待ちます。', deadline=0.1)
+        self.assertLess(time.monotonic() - t, 0.3)
+
+
+if __name__ == '__main__':
+    unittest.main()